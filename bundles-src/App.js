@@ -13,6 +13,13 @@ import NoResults from "./components/NoResults";
 
 import './css/App.css';
 
+function makeIdempotencyKey(){
+  if (window.crypto && window.crypto.randomUUID){
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 class App extends Component {
 
   constructor(props){
@@ -62,6 +69,12 @@ class App extends Component {
 
     let csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
 
+    // Повторная отправка того же заказа идёт с тем же ключом, чтобы сервер не создал дубль
+    let body = JSON.stringify(data);
+    if (!this.pendingCheckout || this.pendingCheckout.body !== body){
+      this.pendingCheckout = {body, idempotencyKey: makeIdempotencyKey()};
+    }
+
     try {
       let response = await fetch(url, {
         method: 'post',
@@ -69,8 +82,9 @@ class App extends Component {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
+          'Idempotency-Key': this.pendingCheckout.idempotencyKey,
         },
-        body: JSON.stringify(data),
+        body: body,
       });
 
       if (!response.ok){
@@ -79,6 +93,7 @@ class App extends Component {
       }
       let responseData = await response.json();
 
+      this.pendingCheckout = null;
       this.setState({
         cart: [],
       });
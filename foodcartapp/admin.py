@@ -5,8 +5,9 @@ from django.templatetags.static import static
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
+from .assignment import assign_restaurants
 from .models import Order, OrderItem, Product
-from .models import Restaurant
+from .models import Restaurant, RestaurantDistance
 from .models import RestaurantMenuItem
 
 
@@ -26,11 +27,21 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'prepare_capacity',
     ]
     inlines = [
         RestaurantMenuItemInline
     ]
 
+    def save_model(self, request, obj, form, change):
+        previous_location_id = obj.location_id
+        if 'address' in form.changed_data or not obj.location_id:
+            obj.update_location()
+        super().save_model(request, obj, form, change)
+        # Расстояния считаются от локации ресторана, поэтому устаревают, только если она сменилась
+        if obj.location_id != previous_location_id:
+            RestaurantDistance.objects.filter(restaurant=obj).delete()
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -116,8 +127,11 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [
         OrderItemInline,
     ]
+    actions = [
+        'assign_nearest_restaurant',
+    ]
 
-    readonly_fields = ['registered_at', ]
+    readonly_fields = ['registered_at', 'total_price']
 
     def response_change(self, request, obj):
         response = super().response_post_save_change(request, obj)
@@ -132,6 +146,16 @@ class OrderAdmin(admin.ModelAdmin):
             return HttpResponseRedirect(request.GET['next'])
         return response
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Order.objects.filter(pk=form.instance.pk).update_total_price()
+
+    def assign_nearest_restaurant(self, request, queryset):
+        orders = list(queryset.filter(cooking_restaurant__isnull=True).prefetch_related('items'))
+        assigned_orders = assign_restaurants(orders)
+        self.message_user(request, f'Назначено ресторанов: {len(assigned_orders)} из {len(orders)}')
+    assign_nearest_restaurant.short_description = 'Передать в ближайший ресторан'
+
     def render_change_form(self, request, context, *args, **kwargs):
         context['adminform'].form.fields['cooking_restaurant'].queryset = (
             Restaurant.objects.suitable_for_order(kwargs['obj'])
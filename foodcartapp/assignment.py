@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from foodcartapp.indexes import get_capability_index, get_spatial_index
+from foodcartapp.models import Order, OrderStatus, Restaurant, RestaurantDistance
+from geolocation.models import Location
+from geolocation.services import geocoding_service
+
+
+def rank_restaurants(orders, geocode_missing=False):
+    """Для каждого заказа подбирает рестораны, где есть в продаже все продукты заказа.
+
+    Возвращает словарь id заказа → список пар (ресторан, расстояние в км),
+    отсортированный от ближнего ресторана к дальнему. Рестораны, расстояние
+    до которых неизвестно или больше DELIVERY_RADIUS_KM, в список не попадают.
+    Расстояния берутся из RestaurantDistance и досчитываются, если их там ещё нет.
+    """
+    prefetch_related_objects(orders, 'items')
+    addresses = {order.address for order in orders}
+    if geocode_missing:
+        locations = geocoding_service.get_locations(addresses)
+    else:
+        locations = Location.objects.get_locations(addresses)
+
+    capability_index = get_capability_index()
+    orders_restaurant_ids = {
+        order.id: capability_index.get_restaurant_ids(order_item.product_id for order_item in order.items.all())
+        for order in orders
+    }
+    if settings.DELIVERY_RADIUS_KM is not None:
+        # Рестораны вне радиуса отсекаются по индексу, и расстояния до них не считаются вовсе
+        for order in orders:
+            nearby_restaurant_ids = find_restaurant_ids_within(locations.get(order.address))
+            orders_restaurant_ids[order.id] = [
+                restaurant_id
+                for restaurant_id in orders_restaurant_ids[order.id]
+                if restaurant_id in nearby_restaurant_ids
+            ]
+    restaurants_by_id = (
+        Restaurant.objects
+        .select_related('location')
+        .in_bulk(set().union(*orders_restaurant_ids.values()))
+    )
+
+    distances = RestaurantDistance.objects.get_distances(
+        {locations[order.address] for order in orders if order.address in locations},
+        {restaurant: restaurant.location for restaurant in restaurants_by_id.values()},
+    )
+
+    orders_restaurants = {}
+    for order in orders:
+        location = locations.get(order.address)
+        order_restaurants = [
+            (restaurants_by_id[restaurant_id], distances[(location.id, restaurant_id)])
+            for restaurant_id in orders_restaurant_ids[order.id]
+            if location and (location.id, restaurant_id) in distances
+        ]
+        orders_restaurants[order.id] = sorted(
+            order_restaurants,
+            key=lambda restaurant_with_distance: restaurant_with_distance[1],
+        )
+    return orders_restaurants
+
+
+def find_restaurant_ids_within(location, radius=None):
+    """Возвращает id ресторанов не дальше radius км от локации, по умолчанию — DELIVERY_RADIUS_KM."""
+    if not location or not location.coordinates:
+        return set()
+    radius = settings.DELIVERY_RADIUS_KM if radius is None else radius
+    return {restaurant_id for restaurant_id, _ in get_spatial_index().within(*location.coordinates, radius)}
+
+
+def find_nearest_restaurant_ids(orders):
+    """Для каждого заказа ищет ближайший ресторан, где есть все продукты заказа.
+
+    Поиск идёт по пространственному индексу ресторанов, а не по всей матрице
+    расстояний. Возвращает словарь id заказа → id ресторана, заказы без
+    координат или без подходящих ресторанов в радиусе DELIVERY_RADIUS_KM
+    в него не попадают.
+    """
+    prefetch_related_objects(orders, 'items')
+    capability_index = get_capability_index()
+    spatial_index = get_spatial_index()
+    locations = Location.objects.get_locations({order.address for order in orders})
+
+    nearest_restaurant_ids = {}
+    for order in orders:
+        location = locations.get(order.address)
+        if not location or not location.coordinates:
+            continue
+        nearest_restaurants = spatial_index.nearest(
+            *location.coordinates,
+            predicate=capability_index.get_predicate(order_item.product_id for order_item in order.items.all()),
+        )
+        if not nearest_restaurants:
+            continue
+        restaurant_id, distance = nearest_restaurants[0]
+        if settings.DELIVERY_RADIUS_KM is None or distance <= settings.DELIVERY_RADIUS_KM:
+            nearest_restaurant_ids[order.id] = restaurant_id
+    return nearest_restaurant_ids
+
+
+def assign_restaurants(orders):
+    """Передаёт каждый заказ в ближайший ресторан, который может его приготовить.
+
+    Возвращает список заказов, которым удалось подобрать ресторан.
+    """
+    nearest_restaurant_ids = find_nearest_restaurant_ids(orders)
+    restaurants_by_id = Restaurant.objects.in_bulk(set(nearest_restaurant_ids.values()))
+    now = timezone.now()
+    assigned_orders = []
+    for order in orders:
+        restaurant = restaurants_by_id.get(nearest_restaurant_ids.get(order.id))
+        if not restaurant:
+            continue
+        order.cooking_restaurant = restaurant
+        order.updated_at = now
+        assigned_orders.append(order)
+    Order.objects.bulk_update(assigned_orders, ['cooking_restaurant', 'updated_at'])
+    return assigned_orders
+
+
+def get_unassigned_orders():
+    return (
+        Order.objects
+        .filter(status=OrderStatus.NEW.value, cooking_restaurant__isnull=True)
+        .prefetch_related('items')
+    )
@@ -0,0 +1,65 @@
+import math
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+from foodcartapp.models import Product
+from foodcartapp.payloads import JsonPayload
+
+CATALOG_CACHE_KEY = 'foodcartapp:catalog'
+CATALOG_VERSION_CACHE_KEY = 'foodcartapp:catalog_version'
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+def get_catalog_version():
+    """Время последнего изменения каталога в целых секундах."""
+    version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_CACHE_KEY, math.ceil(time.time()), timeout=None)
+        version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    return version
+
+
+def build_catalog():
+    # Версия читается до товаров: если каталог изменится во время сборки, снимок сбросят, и его соберут заново
+    version = get_catalog_version()
+    products = Product.objects.select_related('category').available()
+    return JsonPayload(
+        [serialize_product(product) for product in products],
+        last_modified=datetime.fromtimestamp(version, tz=timezone.utc),
+    )
+
+
+def get_catalog():
+    catalog = cache.get(CATALOG_CACHE_KEY)
+    if catalog is None:
+        catalog = build_catalog()
+        cache.set(CATALOG_CACHE_KEY, catalog, timeout=None)
+    return catalog
+
+
+def invalidate_catalog():
+    # Новая версия хотя бы на секунду старше прежней, даже если каталог меняется несколько раз
+    # за секунду, иначе клиент с If-Modified-Since получил бы 304 на устаревший каталог
+    version = max(math.ceil(time.time()), get_catalog_version() + 1)
+    cache.set(CATALOG_VERSION_CACHE_KEY, version, timeout=None)
+    cache.delete(CATALOG_CACHE_KEY)
@@ -0,0 +1,85 @@
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+
+from foodcartapp.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+# Если запрос с ключом не завершился за это время, его обработчик, видимо, упал,
+# и повторный запрос можно выполнить заново
+IDEMPOTENCY_LOCK_TIMEOUT = timedelta(minutes=1)
+
+
+def make_json_response(data, status):
+    # Те же параметры, что у JSONRenderer из DRF, чтобы повтор отдавал ответ байт в байт
+    return JsonResponse(
+        data,
+        status=status,
+        safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def claim_idempotency_key(key, fingerprint):
+    """Занимает ключ за текущим запросом. Возвращает None или запись, занятую другим запросом."""
+    while True:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(key=key, fingerprint=fingerprint)
+            return None
+        except IntegrityError:
+            pass
+        abandoned = IdempotencyKey.objects.filter(
+            key=key,
+            fingerprint=fingerprint,
+            status_code__isnull=True,
+            created_at__lt=timezone.now() - IDEMPOTENCY_LOCK_TIMEOUT,
+        ).update(created_at=timezone.now())
+        if abandoned:
+            return None
+        stored = IdempotencyKey.objects.filter(key=key).first()
+        if stored:
+            return stored
+        # Запрос, занявший ключ, успел упасть и удалить запись. Без записи текущий
+        # запрос ключом не владеет, поэтому пробуем занять ключ заново
+
+
+def idempotent(view):
+    """Повтор запроса с тем же заголовком Idempotency-Key получает сохранённый ответ.
+
+    Сам view при повторе не вызывается. Пока первый запрос обрабатывается,
+    повторы получают 409, а тот же ключ с другим телом запроса — 422.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        raw_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not raw_key:
+            return view(request, *args, **kwargs)
+        key = hashlib.sha256(raw_key.encode()).hexdigest()
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        stored = claim_idempotency_key(key, fingerprint)
+        if stored and stored.fingerprint != fingerprint:
+            return make_json_response({'error': 'Этот ключ идемпотентности уже использован для другого запроса'}, 422)
+        if stored and stored.status_code is None:
+            response = make_json_response({'error': 'Запрос с этим ключом идемпотентности ещё обрабатывается'}, 409)
+            response['Retry-After'] = 1
+            return response
+        if stored:
+            return make_json_response(stored.response, stored.status_code)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(key=key).delete()
+            raise
+        if response.status_code >= 500:
+            IdempotencyKey.objects.filter(key=key).delete()
+        else:
+            IdempotencyKey.objects.filter(key=key).update(status_code=response.status_code, response=response.data)
+        return response
+    return wrapper
@@ -0,0 +1,120 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+
+from foodcartapp.models import Restaurant, RestaurantMenuItem
+from geolocation.spatial import SpatialIndex
+
+CAPABILITY_INDEX_CACHE_KEY = 'foodcartapp:restaurant_capability_index'
+SPATIAL_INDEX_VERSION_CACHE_KEY = 'foodcartapp:restaurant_spatial_index_version'
+
+
+class RestaurantCapabilityIndex:
+    """Для каждого продукта хранит битовую маску ресторанов, в которых он есть в продаже."""
+
+    def __init__(self, menu_items):
+        self.restaurant_ids = []
+        self.restaurant_bits = {}
+        self.product_masks = {}
+        for restaurant_id, product_id in menu_items:
+            if restaurant_id not in self.restaurant_bits:
+                self.restaurant_bits[restaurant_id] = 1 << len(self.restaurant_ids)
+                self.restaurant_ids.append(restaurant_id)
+            self.product_masks[product_id] = (
+                self.product_masks.get(product_id, 0) | self.restaurant_bits[restaurant_id]
+            )
+
+    @classmethod
+    def build(cls):
+        menu_items = (
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('restaurant_id', 'product_id')
+        )
+        return cls(menu_items)
+
+    def get_mask(self, product_ids):
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        mask = (1 << len(self.restaurant_ids)) - 1
+        for product_id in product_ids:
+            mask &= self.product_masks.get(product_id, 0)
+        return mask
+
+    def get_restaurant_ids(self, product_ids):
+        """Возвращает id ресторанов, которые могут приготовить все продукты сразу."""
+        mask = self.get_mask(product_ids)
+        return [
+            restaurant_id
+            for bit, restaurant_id in enumerate(self.restaurant_ids)
+            if mask >> bit & 1
+        ]
+
+    def get_predicate(self, product_ids):
+        """Возвращает функцию, которая по id ресторана проверяет, может ли он приготовить все продукты сразу."""
+        mask = self.get_mask(product_ids)
+        return lambda restaurant_id: bool(mask & self.restaurant_bits.get(restaurant_id, 0))
+
+
+def get_capability_index():
+    index = cache.get(CAPABILITY_INDEX_CACHE_KEY)
+    if index is None:
+        index = RestaurantCapabilityIndex.build()
+        cache.set(CAPABILITY_INDEX_CACHE_KEY, index, timeout=None)
+    return index
+
+
+def invalidate_capability_index():
+    cache.delete(CAPABILITY_INDEX_CACHE_KEY)
+
+
+def build_spatial_index():
+    restaurants = Restaurant.objects.select_related('location').filter(
+        location__latitude__isnull=False,
+        location__longitude__isnull=False,
+    )
+    return SpatialIndex([
+        (restaurant.id, *restaurant.location.coordinates)
+        for restaurant in restaurants
+    ])
+
+
+class ProcessSpatialIndex:
+    """Держит KD-дерево ресторанов в памяти процесса.
+
+    Дерево не кладётся в кеш Django: кеш отдавал бы копию, и каждый поиск
+    начинался бы с распаковки всего дерева. В кеше хранится только номер
+    версии. Его удаление говорит всем процессам, что дерево надо перестроить.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(SPATIAL_INDEX_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+            version = cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY)
+        with self._lock:
+            if self.index is None or self.version != version:
+                # Версия прочитана до построения: если рестораны изменятся во время
+                # построения, версию удалят, и следующий вызов перестроит дерево снова
+                self.index = build_spatial_index()
+                self.version = version
+            return self.index
+
+
+spatial_index = ProcessSpatialIndex()
+
+
+def get_spatial_index():
+    """Индекс ресторанов по их координатам, ключи индекса — id ресторанов."""
+    return spatial_index.get()
+
+
+def invalidate_spatial_index():
+    cache.delete(SPATIAL_INDEX_VERSION_CACHE_KEY)
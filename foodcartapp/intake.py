@@ -0,0 +1,140 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+
+from foodcartapp.models import Order, OrderItem, Product
+from geolocation.models import GeocodingJob
+
+
+def make_order_items(order, products_fields):
+    """Собирает позиции заказа и записывает их сумму в order.total_price."""
+    # Цена берётся из каталога, если она не записана заранее, как в журнале приёма заказов
+    order_items = [
+        OrderItem(order=order, **{'price': fields['product'].price, **fields})
+        for fields in products_fields
+    ]
+    # bulk_create не шлёт post_save, поэтому сумму заказа не пересчитает сигнал
+    order.total_price = sum(order_item.quantity * order_item.price for order_item in order_items)
+    return order_items
+
+
+def create_order(order_fields, products_fields):
+    """Сохраняет заказ вместе с позициями.
+
+    Транзакция охватывает только запись в базу. Всё остальное, например
+    постановка адреса в очередь геокодирования, выполняется после коммита.
+    """
+    order = Order(**order_fields)
+    order_items = make_order_items(order, products_fields)
+    with transaction.atomic():
+        order.save()
+        OrderItem.objects.bulk_create(order_items)
+        transaction.on_commit(lambda: handle_created_orders([order]))
+    return order
+
+
+def create_orders(orders_fields):
+    """Сохраняет пачку заказов парой запросов bulk_create.
+
+    orders_fields — список пар (поля заказа, поля позиций заказа).
+    """
+    orders = [Order(**order_fields) for order_fields, _ in orders_fields]
+    order_items = [
+        order_item
+        for order, (_, products_fields) in zip(orders, orders_fields)
+        for order_item in make_order_items(order, products_fields)
+    ]
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+            # bulk_create не шлёт post_save, а на него подписана, например, страница заказов менеджера
+            for order in orders:
+                post_save.send(sender=Order, instance=order, created=True, update_fields=None, raw=False,
+                               using=connection.alias)
+        else:
+            # База не возвращает id вставленных строк, а без них не сохранить позиции
+            for order in orders:
+                order.save()
+        OrderItem.objects.bulk_create(order_items)
+        transaction.on_commit(lambda: handle_created_orders(orders))
+    return orders
+
+
+def handle_created_orders(orders):
+    GeocodingJob.objects.enqueue_many([order.address for order in orders])
+
+
+def make_journal_payload(order_fields, products_fields):
+    return {
+        'order': {name: str(value) for name, value in order_fields.items()},
+        'products': [
+            {'product': fields['product'].id, 'quantity': fields['quantity'], 'price': str(fields['product'].price)}
+            for fields in products_fields
+        ],
+    }
+
+
+def journal_orders(journal, orders_fields):
+    """Записывает заказы в журнал приёма и возвращает их предварительные номера."""
+    return journal.append([
+        make_journal_payload(order_fields, products_fields)
+        for order_fields, products_fields in orders_fields
+    ])
+
+
+def flush_order_journal(journal, count):
+    """Переносит до count заказов из журнала приёма в базу.
+
+    Возвращает число обработанных записей журнала и список пар (номер, данные
+    заказа) для отклонённых заказов: все их товары успели удалить из каталога.
+
+    Одновременно журнал переносит только один процесс, остальные ждут блокировку.
+    Если прошлый перенос упал после коммита в базу, но до отметки в журнале,
+    такие заказы уже есть в базе: они находятся по journal_id и не дублируются.
+    """
+    with journal.flush_lock():
+        return flush_pending_entries(journal, journal.get_pending(count))
+
+
+def flush_pending_entries(journal, entries):
+    if not entries:
+        return 0, []
+    flushed_ids = set(
+        Order.objects.filter(journal_id__in=[journal_id for journal_id, _, _ in entries])
+        .values_list('journal_id', flat=True)
+    )
+    products = Product.objects.in_bulk({
+        product_fields['product']
+        for _, payload, _ in entries
+        for product_fields in payload['products']
+    })
+
+    orders_fields = []
+    rejected_entries = []
+    for journal_id, payload, created_at in entries:
+        if journal_id in flushed_ids:
+            continue
+        order_fields = {
+            **payload['order'],
+            'journal_id': journal_id,
+            'registered_at': datetime.fromtimestamp(created_at, tz=timezone.utc),
+        }
+        # Позиции с товарами, которые успели удалить из каталога, пропускаются
+        products_fields = [
+            {
+                'product': products[product_fields['product']],
+                'quantity': product_fields['quantity'],
+                'price': Decimal(product_fields['price']),
+            }
+            for product_fields in payload['products']
+            if product_fields['product'] in products
+        ]
+        if not products_fields:
+            rejected_entries.append((journal_id, payload))
+            continue
+        orders_fields.append((order_fields, products_fields))
+    create_orders(orders_fields)
+    journal.mark_flushed([journal_id for journal_id, _, _ in entries])
+    return len(entries), rejected_entries
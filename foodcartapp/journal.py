@@ -0,0 +1,114 @@
+import fcntl
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+
+JOURNAL_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        journal_id TEXT NOT NULL UNIQUE,
+        payload TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        flushed_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS entries_pending ON entries (id) WHERE flushed_at IS NULL;
+'''
+
+
+class OrderJournal:
+    """Журнал приёма заказов в отдельном файле SQLite.
+
+    В часы пиковой нагрузки заказ записывается сюда и сразу подтверждается
+    клиенту, а в основную базу его переносит flush_order_journal. Файл
+    работает в режиме WAL, запись попадает на диск до ответа клиенту.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.executescript(JOURNAL_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def append(self, payloads):
+        """Записывает заказы в журнал одной транзакцией и возвращает их предварительные номера."""
+        journal_ids = [uuid.uuid4() for _ in payloads]
+        created_at = time.time()
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'INSERT INTO entries (journal_id, payload, created_at) VALUES (?, ?, ?)',
+                [
+                    (str(journal_id), json.dumps(payload, ensure_ascii=False), created_at)
+                    for journal_id, payload in zip(journal_ids, payloads)
+                ],
+            )
+        return journal_ids
+
+    @contextmanager
+    def flush_lock(self):
+        """Блокировка переноса: пока она взята, другие процессы ждут, а не переносят те же записи.
+
+        Блокировку держит ОС на файле рядом с журналом, поэтому она снимается
+        сама, если переносивший процесс упал.
+        """
+        with open(f'{self.path}.flush-lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_pending(self, count):
+        """Возвращает до count ещё не перенесённых записей: (номер, данные заказа, время записи)."""
+        rows = self.connection.execute(
+            'SELECT journal_id, payload, created_at FROM entries WHERE flushed_at IS NULL ORDER BY id LIMIT ?',
+            (count,),
+        )
+        return [(uuid.UUID(journal_id), json.loads(payload), created_at) for journal_id, payload, created_at in rows]
+
+    def mark_flushed(self, journal_ids):
+        flushed_at = time.time()
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'UPDATE entries SET flushed_at = ? WHERE journal_id = ?',
+                [(flushed_at, str(journal_id)) for journal_id in journal_ids],
+            )
+
+    def prune(self, max_age):
+        """Удаляет перенесённые записи старше max_age секунд."""
+        cursor = self.connection.execute(
+            'DELETE FROM entries WHERE flushed_at < ?',
+            (time.time() - max_age,),
+        )
+        return cursor.rowcount
+
+    def get_lag(self):
+        """Возвращает число ожидающих переноса записей и возраст самой старой из них в секундах."""
+        pending_count, oldest_created_at = self.connection.execute(
+            'SELECT COUNT(*), MIN(created_at) FROM entries WHERE flushed_at IS NULL'
+        ).fetchone()
+        return pending_count, time.time() - oldest_created_at if oldest_created_at else 0
+
+
+@lru_cache(maxsize=None)
+def get_order_journal():
+    """Журнал из настройки ORDER_JOURNAL_PATH или None, если заказы пишутся сразу в базу."""
+    if not settings.ORDER_JOURNAL_PATH:
+        return None
+    return OrderJournal(settings.ORDER_JOURNAL_PATH)
@@ -0,0 +1,41 @@
+from django.db.models import BooleanField, Case, Value, When
+
+from foodcartapp.models import Order, Restaurant
+from geolocation.addresses import normalize_address
+from geolocation.models import Location
+
+
+def get_active_addresses():
+    """Адреса ресторанов и открытых заказов: их координаты нужны в первую очередь."""
+    addresses = set(Restaurant.objects.values_list('address', flat=True))
+    addresses |= set(Order.objects.not_done().values_list('address', flat=True))
+    return addresses
+
+
+def get_new_locations():
+    """Локации для активных адресов, которых ещё нет в базе."""
+    address_keys = {normalize_address(address): address for address in get_active_addresses()}
+    known_keys = set(
+        Location.objects.filter(normalized_address__in=address_keys).values_list('normalized_address', flat=True)
+    )
+    return [
+        Location(raw_address=address, normalized_address=address_key)
+        for address_key, address in address_keys.items()
+        if address_key not in known_keys
+    ]
+
+
+def get_stale_locations(stale_before, count):
+    """Локации, которые пора геокодировать заново, сначала активные адреса, затем самые старые."""
+    active_keys = {normalize_address(address) for address in get_active_addresses()}
+    return list(
+        Location.objects
+        .needs_geocoding(stale_before)
+        .due_for_geocoding()
+        .annotate(is_active=Case(
+            When(normalized_address__in=active_keys, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ))
+        .order_by('-is_active', 'updated_at')[:count]
+    )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import assign_restaurants, get_unassigned_orders
+
+
+class Command(BaseCommand):
+    help = 'Передаёт новые заказы без ресторана в ближайшие рестораны, которые могут их приготовить'
+
+    def handle(self, *args, **options):
+        orders = list(get_unassigned_orders())
+        assigned_orders = assign_restaurants(orders)
+        for order in assigned_orders:
+            self.stdout.write(f'Заказ {order.id}: {order.cooking_restaurant}')
+        self.stdout.write(f'Назначено ресторанов: {len(assigned_orders)} из {len(orders)}')
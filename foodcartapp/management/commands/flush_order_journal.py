@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.intake import flush_order_journal
+from foodcartapp.journal import get_order_journal
+
+
+class Command(BaseCommand):
+    help = 'Переносит заказы из журнала приёма в базу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Сколько заказов переносить за один проход')
+        parser.add_argument('--sleep', type=float, default=1, help='Пауза в секундах, когда переносить нечего')
+        parser.add_argument('--once', action='store_true', help='Перенести все заказы и завершиться')
+        parser.add_argument(
+            '--prune-hours',
+            type=int,
+            default=24,
+            help='Через сколько часов удалять из журнала перенесённые заказы',
+        )
+        parser.add_argument('--stats', action='store_true', help='Только показать отставание журнала')
+
+    def handle(self, *args, **options):
+        journal = get_order_journal()
+        if not journal:
+            raise CommandError('Журнал приёма заказов не настроен, задайте ORDER_JOURNAL_PATH')
+        if options['stats']:
+            self.write_lag(journal)
+            return
+
+        while True:
+            flushed_count, rejected_entries = flush_order_journal(journal, options['batch_size'])
+            for journal_id, payload in rejected_entries:
+                self.stderr.write(f'{journal_id}: все товары заказа удалены из каталога, заказ не создан: {payload}')
+            if flushed_count:
+                self.stdout.write(f'Перенесено записей: {flushed_count}, отклонено заказов: {len(rejected_entries)}')
+                self.write_lag(journal)
+                continue
+            journal.prune(options['prune_hours'] * 60 * 60)
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
+
+    def write_lag(self, journal):
+        pending_count, lag = journal.get_lag()
+        self.stdout.write(f'Ожидают переноса: {pending_count}, отставание: {lag:.1f} с')
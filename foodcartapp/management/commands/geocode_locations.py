@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from geopy.exc import GeopyError
+
+from foodcartapp.locations import get_new_locations
+from geolocation.backends import RateLimiter
+from geolocation.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса без координат и устаревшие адреса, включая адреса всех ресторанов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Сколько адресов геокодировать одновременно')
+        parser.add_argument('--rate', type=float, default=10, help='Сколько запросов в секунду можно слать геокодеру')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Сколько локаций сохранять за один запрос')
+        parser.add_argument('--max-age', type=int, help='Обновить и координаты, которым больше стольких дней')
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(days=options['max_age']) if options['max_age'] is not None else None
+        locations = list(Location.objects.needs_geocoding(stale_before).due_for_geocoding()) + get_new_locations()
+        self.stdout.write(f'Адресов для геокодирования: {len(locations)}')
+
+        rate_limiter = RateLimiter(options['rate'])
+
+        def geocode(location):
+            rate_limiter.wait()
+            try:
+                return location, location.process_coordinates()
+            except GeopyError as error:
+                self.stderr.write(f'{location.raw_address}: {error}')
+                return None, False
+
+        # Ненайденные адреса тоже сохраняются: с ними записывается время следующей попытки
+        processed_locations = []
+        geocoded_count = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for location, is_geocoded in executor.map(geocode, locations):
+                if not location:
+                    continue
+                processed_locations.append(location)
+                geocoded_count += is_geocoded
+                if len(processed_locations) >= options['chunk_size']:
+                    Location.objects.save_geocoded(processed_locations)
+                    processed_locations = []
+        Location.objects.save_geocoded(processed_locations)
+        self.stdout.write(f'Геокодировано адресов: {geocoded_count} из {len(locations)}')
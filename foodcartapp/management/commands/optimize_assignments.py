@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import get_unassigned_orders
+from foodcartapp.optimizer import apply_plan, plan_assignments
+
+
+class Command(BaseCommand):
+    help = 'Распределяет новые заказы по ресторанам с учётом их загрузки, минимизируя суммарное расстояние'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только рассчитать план, не сохраняя его')
+
+    def handle(self, *args, **options):
+        orders = list(get_unassigned_orders().order_by('registered_at', 'id'))
+        plan = plan_assignments(orders)
+        self.stdout.write(f'Заказов в очереди: {len(orders)}')
+        self.stdout.write(f'Жадное распределение: {len(plan.greedy_assignments)} заказов, {plan.greedy_cost:.2f} км')
+        self.stdout.write(f'Оптимальное распределение: {len(plan.assignments)} заказов, {plan.cost:.2f} км')
+        self.stdout.write(f'Время расчёта: {plan.solve_time * 1000:.1f} мс')
+        if options['dry_run']:
+            return
+        assigned_orders = apply_plan(orders, plan)
+        self.stdout.write(f'Назначено ресторанов: {len(assigned_orders)}')
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие ключи идемпотентности заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl',
+            type=int,
+            default=settings.IDEMPOTENCY_KEY_TTL_HOURS,
+            help='Сколько часов хранить ключ',
+        )
+
+    def handle(self, *args, **options):
+        deleted_count, _ = IdempotencyKey.objects.expired(timedelta(hours=options['ttl'])).delete()
+        self.stdout.write(f'Удалено ключей: {deleted_count}')
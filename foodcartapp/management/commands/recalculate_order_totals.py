@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённые суммы заказов с их позициями и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только проверить, ничего не исправляя')
+        parser.add_argument('--all', action='store_true', help='Пересчитать суммы всех заказов без сверки')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            updated_count = Order.objects.update_total_price()
+            self.stdout.write(f'Пересчитано заказов: {updated_count}')
+            return
+
+        wrong_orders = list(
+            Order.objects.with_wrong_total_price().values_list('id', 'total_price', 'items_total_price')
+        )
+        for order_id, total_price, items_total_price in wrong_orders:
+            self.stdout.write(f'Заказ {order_id}: сохранено {total_price}, по позициям {items_total_price}')
+        if options['check']:
+            if wrong_orders:
+                raise CommandError(f'Заказов с неверной суммой: {len(wrong_orders)}')
+            self.stdout.write('Суммы всех заказов верны')
+            return
+
+        updated_count = Order.objects.filter(id__in=[order_id for order_id, _, _ in wrong_orders]).update_total_price()
+        self.stdout.write(f'Исправлено заказов: {updated_count}')
@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from geopy.exc import GeopyError
+
+from foodcartapp.locations import get_stale_locations
+from geolocation.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Понемногу обновляет устаревшие координаты, начиная с адресов ресторанов и открытых заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=settings.GEOCODER_MAX_AGE_DAYS,
+            help='Через сколько дней координаты считаются устаревшими',
+        )
+        parser.add_argument('--batch-size', type=int, default=10, help='Сколько адресов обновлять за один проход')
+        parser.add_argument('--sleep', type=float, default=60, help='Пауза в секундах, когда обновлять нечего')
+        parser.add_argument('--once', action='store_true', help='Обновить все устаревшие адреса и завершиться')
+
+    def handle(self, *args, **options):
+        max_age = timedelta(days=options['max_age'])
+        while True:
+            locations = get_stale_locations(timezone.now() - max_age, options['batch_size'])
+            processed_locations = []
+            for location in locations:
+                try:
+                    is_geocoded = location.process_coordinates()
+                except GeopyError as error:
+                    self.stderr.write(f'{location.raw_address}: {error}')
+                    continue
+                processed_locations.append(location)
+                if is_geocoded:
+                    self.stdout.write(f'{location.raw_address}: {location.latitude} {location.longitude}')
+                else:
+                    self.stdout.write(f'{location.raw_address}: адрес не найден, повтор {location.next_retry_at}')
+            Location.objects.save_geocoded(processed_locations)
+            if processed_locations:
+                continue
+            # Обновлять нечего или геокодер недоступен: ждём, чтобы не крутиться вхолостую
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0051_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='prepare_capacity',
+            field=models.PositiveSmallIntegerField(default=10, verbose_name='сколько заказов может готовить одновременно'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0005_geocodingjob'),
+        ('foodcartapp', '0052_restaurant_prepare_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantDistance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(verbose_name='расстояние, км')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_distances', to='geolocation.location', verbose_name='локация')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distances', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'расстояние до ресторана',
+                'verbose_name_plural': 'расстояния до ресторанов',
+                'unique_together': {('location', 'restaurant')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:49
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия geolocation.addresses.normalize_address на момент миграции: миграция
+# должна давать тот же результат, даже если нормализация потом изменится
+ADDRESS_TOKEN_PATTERN = re.compile(r'\w+(?:-\w+)*')
+
+ADDRESS_ABBREVIATIONS = {
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+}
+
+ADDRESS_NOISE_WORDS = {'г', 'город', 'д', 'дом'}
+
+
+def normalize_address(address):
+    tokens = ADDRESS_TOKEN_PATTERN.findall(address.casefold().replace('ё', 'е'))
+    tokens = [ADDRESS_ABBREVIATIONS.get(token, token) for token in tokens]
+    return ' '.join(token for token in tokens if token not in ADDRESS_NOISE_WORDS)
+
+
+def link_locations(apps, schema_editor):
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    Location = apps.get_model('geolocation', 'Location')
+    for restaurant in Restaurant.objects.exclude(address=''):
+        location = Location.objects.filter(normalized_address=normalize_address(restaurant.address)).first()
+        if location:
+            restaurant.location = location
+            restaurant.save(update_fields=['location'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0009_auto_20261018_0747'),
+        ('foodcartapp', '0053_restaurantdistance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restaurants', to='geolocation.location', verbose_name='локация'),
+        ),
+        migrations.RunPython(link_locations, migrations.RunPython.noop),
+    ]
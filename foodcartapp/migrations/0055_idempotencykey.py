@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0054_restaurant_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256 ключа идемпотентности')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='SHA-256 тела запроса')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='код ответа')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='ответ')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='дата запроса')),
+            ],
+            options={
+                'verbose_name': 'ключ идемпотентности',
+                'verbose_name_plural': 'ключи идемпотентности',
+            },
+        ),
+    ]
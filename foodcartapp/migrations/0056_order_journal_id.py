@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='journal_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='Номер в журнале приёма заказов'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:55
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_total_price(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+    items_total_price = (
+        OrderItem.objects
+        .filter(order=models.OuterRef('pk'))
+        .values('order')
+        .annotate(total_price=models.Sum(models.F('quantity') * models.F('price')))
+        .values('total_price')
+    )
+    Order.objects.update(total_price=Coalesce(
+        models.Subquery(items_total_price, output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+        Decimal(0),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0056_order_journal_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Сумма заказа'),
+        ),
+        migrations.RunPython(fill_total_price, migrations.RunPython.noop),
+    ]
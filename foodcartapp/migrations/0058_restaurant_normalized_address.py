@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:21
+
+import re
+
+from django.db import migrations, models
+
+# Копия geolocation.addresses.normalize_address на момент миграции: миграция
+# должна давать тот же результат, даже если нормализация потом изменится
+ADDRESS_TOKEN_PATTERN = re.compile(r'\w+(?:-\w+)*')
+
+ADDRESS_ABBREVIATIONS = {
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+}
+
+ADDRESS_NOISE_WORDS = {'г', 'город', 'д', 'дом'}
+
+
+def normalize_address(address):
+    tokens = ADDRESS_TOKEN_PATTERN.findall(address.casefold().replace('ё', 'е'))
+    tokens = [ADDRESS_ABBREVIATIONS.get(token, token) for token in tokens]
+    return ' '.join(token for token in tokens if token not in ADDRESS_NOISE_WORDS)
+
+
+def fill_normalized_address(apps, schema_editor):
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    for restaurant in Restaurant.objects.exclude(address=''):
+        restaurant.normalized_address = normalize_address(restaurant.address)
+        restaurant.save(update_fields=['normalized_address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_order_total_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='normalized_address',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=1024, verbose_name='нормализованный адрес'),
+        ),
+        migrations.RunPython(fill_normalized_address, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,16 @@
+from decimal import Decimal
 from enum import Enum, auto
 
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
+from geolocation.addresses import normalize_address
+from geolocation.distances import get_distance_matrix
+from geolocation.models import Location
+
 
 class OrderStatus(Enum):
     NEW = auto()
@@ -41,11 +47,31 @@ class Restaurant(models.Model):
         max_length=100,
         blank=True,
     )
+    normalized_address = models.CharField(
+        'нормализованный адрес',
+        max_length=1024,
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
     contact_phone = models.CharField(
         'контактный телефон',
         max_length=50,
         blank=True,
     )
+    prepare_capacity = models.PositiveSmallIntegerField(
+        'сколько заказов может готовить одновременно',
+        default=10,
+    )
+    location = models.ForeignKey(
+        Location,
+        related_name='restaurants',
+        verbose_name='локация',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+    )
 
     objects = RestaurantQuerySet.as_manager()
 
@@ -56,6 +82,17 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+    def update_location(self):
+        """Привязывает ресторан к локации его адреса, геокодируя адрес, если локации ещё нет."""
+        if not self.address:
+            self.location = None
+            return
+        self.location = Location.objects.get_locations([self.address], geocode_missing=True).get(self.address)
+
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
@@ -154,13 +191,51 @@ class RestaurantMenuItem(models.Model):
         return f'{self.restaurant.name} - {self.product.name}'
 
 
+def get_items_total_price(order_ref):
+    """Подзапрос: сумма позиций заказа, на который ссылается order_ref."""
+    items_total_price = (
+        OrderItem.objects
+        .filter(order=order_ref)
+        .values('order')
+        .annotate(total_price=models.Sum(models.F('quantity') * models.F('price')))
+        .values('total_price')
+    )
+    return Coalesce(
+        models.Subquery(items_total_price, output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+        Decimal(0),
+    )
+
+
 class OrderQuerySet(models.query.QuerySet):
-    def total_price(self):
-        return self.annotate(total=models.Sum(models.F('items__quantity') * models.F('items__price')))
+    def with_items_total_price(self):
+        """Добавляет сумму позиций, посчитанную заново, для сверки с полем total_price."""
+        return self.annotate(items_total_price=get_items_total_price(models.OuterRef('pk')))
+
+    def with_wrong_total_price(self):
+        return self.with_items_total_price().exclude(total_price=models.F('items_total_price'))
+
+    def update_total_price(self, **fields):
+        """Пересчитывает total_price одним запросом UPDATE. fields обновляются тем же запросом."""
+        return self.update(total_price=get_items_total_price(models.OuterRef('pk')), **fields)
 
     def not_done(self):
         return self.exclude(status__in=[OrderStatus.DONE.value, OrderStatus.CANCELED.value])
 
+    def after(self, status, registered_at, order_id):
+        """Заказы, идущие после указанного при сортировке по статусу, дате регистрации и id."""
+        return self.filter(
+            models.Q(status__gt=status)
+            | models.Q(status=status, registered_at__gt=registered_at)
+            | models.Q(status=status, registered_at=registered_at, id__gt=order_id)
+        )
+
+    def changed_after(self, updated_at, order_id):
+        """Заказы, идущие после указанного при сортировке по дате изменения и id."""
+        return self.filter(
+            models.Q(updated_at__gt=updated_at)
+            | models.Q(updated_at=updated_at, id__gt=order_id)
+        )
+
 
 class Order(models.Model):
     ORDER_STATUS_CHOICES = [
@@ -197,6 +272,11 @@ class Order(models.Model):
         default=timezone.now,
         db_index=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
     called_at = models.DateTimeField(
         verbose_name='Дата звонка',
         blank=True,
@@ -217,6 +297,21 @@ class Order(models.Model):
         blank=True,
         null=True,
     )
+    total_price = models.DecimalField(
+        verbose_name='Сумма заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+    journal_id = models.UUIDField(
+        verbose_name='Номер в журнале приёма заказов',
+        unique=True,
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     objects = OrderQuerySet.as_manager()
 
@@ -240,3 +335,116 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f'{self.product} {self.order} {self.quantity} {self.price}'
+
+
+class RestaurantDistanceQuerySet(models.QuerySet):
+    def get_distances(self, locations, restaurant_locations):
+        """Возвращает словарь (id локации, id ресторана) → расстояние в км.
+
+        restaurant_locations — словарь ресторан → локация его адреса. Расстояния,
+        которых ещё нет в базе, считаются одной матрицей и сохраняются.
+        """
+        locations = [location for location in locations if location.coordinates]
+        restaurant_locations = {
+            restaurant: location
+            for restaurant, location in restaurant_locations.items()
+            if location and location.coordinates
+        }
+        distances = {
+            (location_id, restaurant_id): distance
+            for location_id, restaurant_id, distance in self.filter(
+                location__in=locations,
+                restaurant__in=restaurant_locations,
+            ).values_list('location_id', 'restaurant_id', 'distance')
+        }
+
+        missing_locations = [
+            location
+            for location in locations
+            if any((location.id, restaurant.id) not in distances for restaurant in restaurant_locations)
+        ]
+        if not missing_locations:
+            return distances
+        restaurants = list(restaurant_locations)
+        distance_matrix = get_distance_matrix(
+            [location.coordinates for location in missing_locations],
+            [restaurant_locations[restaurant].coordinates for restaurant in restaurants],
+        )
+        new_distances = []
+        for location, location_distances in zip(missing_locations, distance_matrix):
+            for restaurant, distance in zip(restaurants, location_distances.tolist()):
+                if (location.id, restaurant.id) in distances:
+                    continue
+                distances[(location.id, restaurant.id)] = distance
+                new_distances.append(RestaurantDistance(location=location, restaurant=restaurant, distance=distance))
+        self.bulk_create(new_distances, ignore_conflicts=True)
+        return distances
+
+
+class RestaurantDistance(models.Model):
+    location = models.ForeignKey(
+        Location,
+        related_name='restaurant_distances',
+        verbose_name='локация',
+        on_delete=models.CASCADE,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        related_name='distances',
+        verbose_name='ресторан',
+        on_delete=models.CASCADE,
+    )
+    distance = models.FloatField('расстояние, км')
+
+    objects = RestaurantDistanceQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'расстояние до ресторана'
+        verbose_name_plural = 'расстояния до ресторанов'
+        unique_together = [
+            ['location', 'restaurant']
+        ]
+
+    def __str__(self):
+        return f'{self.location.raw_address} - {self.restaurant.name} {self.distance}'
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self, ttl):
+        return self.filter(created_at__lt=timezone.now() - ttl)
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        'SHA-256 ключа идемпотентности',
+        max_length=64,
+        primary_key=True,
+    )
+    fingerprint = models.CharField(
+        'SHA-256 тела запроса',
+        max_length=64,
+    )
+    status_code = models.PositiveSmallIntegerField(
+        'код ответа',
+        null=True,
+        blank=True,
+    )
+    response = models.JSONField(
+        'ответ',
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        'дата запроса',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return f'{self.key} {self.status_code}'
@@ -0,0 +1,173 @@
+import heapq
+import math
+import time
+
+from django.db import models
+from django.utils import timezone
+
+from foodcartapp.assignment import rank_restaurants
+from foodcartapp.models import Order, OrderStatus
+
+
+class MinCostFlow:
+    """Поток минимальной стоимости методом последовательных кратчайших путей.
+
+    Стоимости рёбер должны быть неотрицательными. Путь ищется алгоритмом
+    Дейкстры по приведённым стоимостям и только от одной вершины-источника,
+    поэтому поиск обычно заканчивается, не обойдя весь граф.
+    """
+
+    def __init__(self, nodes_count):
+        self.graph = [[] for _ in range(nodes_count)]
+        self.potentials = [0] * nodes_count
+        self.cost = 0
+
+    def add_edge(self, source, target, capacity, cost):
+        self.graph[source].append([target, capacity, cost, len(self.graph[target])])
+        self.graph[target].append([source, 0, -cost, len(self.graph[source]) - 1])
+
+    def add_source(self, node):
+        """Подбирает потенциал новой вершины так, чтобы приведённые стоимости её рёбер не были отрицательными."""
+        self.potentials[node] = max(
+            [self.potentials[target] - cost for target, capacity, cost, _ in self.graph[node] if capacity > 0],
+            default=0,
+        )
+
+    def augment(self, source, sink):
+        """Пускает поток по кратчайшему пути из source в sink, возвращает его величину."""
+        distances = {source: 0}
+        previous = {}
+        settled = set()
+        heap = [(0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node == sink:
+                break
+            for edge_index, (target, capacity, cost, _) in enumerate(self.graph[node]):
+                if capacity <= 0 or target in settled:
+                    continue
+                target_distance = distance + cost + self.potentials[node] - self.potentials[target]
+                if target_distance < distances.get(target, math.inf):
+                    distances[target] = target_distance
+                    previous[target] = (node, edge_index)
+                    heapq.heappush(heap, (target_distance, target))
+        if sink not in settled:
+            return 0
+
+        for node in settled:
+            self.potentials[node] += distances[node] - distances[sink]
+
+        path_flow = math.inf
+        node = sink
+        while node != source:
+            previous_node, edge_index = previous[node]
+            path_flow = min(path_flow, self.graph[previous_node][edge_index][1])
+            node = previous_node
+        node = sink
+        while node != source:
+            previous_node, edge_index = previous[node]
+            edge = self.graph[previous_node][edge_index]
+            edge[1] -= path_flow
+            self.graph[node][edge[3]][1] += path_flow
+            self.cost += path_flow * edge[2]
+            node = previous_node
+        return path_flow
+
+
+class AssignmentPlan:
+    def __init__(self, assignments, cost, greedy_assignments, greedy_cost, solve_time):
+        self.assignments = assignments
+        self.cost = cost
+        self.greedy_assignments = greedy_assignments
+        self.greedy_cost = greedy_cost
+        self.solve_time = solve_time
+
+
+def get_free_capacities(restaurants):
+    loads = dict(
+        Order.objects
+        .filter(
+            cooking_restaurant__in=restaurants,
+            status__in=[OrderStatus.NEW.value, OrderStatus.PREPARE.value],
+        )
+        .values_list('cooking_restaurant')
+        .annotate(load=models.Count('id'))
+    )
+    return {
+        restaurant.id: max(restaurant.prepare_capacity - loads.get(restaurant.id, 0), 0)
+        for restaurant in restaurants
+    }
+
+
+def assign_greedily(orders, orders_restaurants, free_capacities):
+    free_capacities = dict(free_capacities)
+    assignments = {}
+    cost = 0
+    for order in orders:
+        for restaurant, distance in orders_restaurants[order.id]:
+            if free_capacities[restaurant.id] > 0:
+                free_capacities[restaurant.id] -= 1
+                assignments[order.id] = restaurant
+                cost += distance
+                break
+    return assignments, cost
+
+
+def plan_assignments(orders):
+    """Распределяет заказы по ресторанам так, чтобы суммарный путь был минимальным.
+
+    Ресторан не получает больше заказов, чем может готовить одновременно
+    с учётом уже переданных ему заказов. Если мест на всех не хватает,
+    предпочтение получают заказы, идущие в списке раньше. Для выбранных
+    заказов суммарное расстояние до ресторанов минимально.
+    """
+    orders_restaurants = rank_restaurants(orders)
+    restaurants = list({
+        restaurant.id: restaurant
+        for order_restaurants in orders_restaurants.values()
+        for restaurant, _ in order_restaurants
+    }.values())
+    free_capacities = get_free_capacities(restaurants)
+    greedy_assignments, greedy_cost = assign_greedily(orders, orders_restaurants, free_capacities)
+
+    started_at = time.perf_counter()
+    sink = len(orders) + len(restaurants)
+    restaurant_nodes = {restaurant.id: len(orders) + index for index, restaurant in enumerate(restaurants)}
+    flow_network = MinCostFlow(sink + 1)
+    for restaurant in restaurants:
+        flow_network.add_edge(restaurant_nodes[restaurant.id], sink, free_capacities[restaurant.id], 0)
+
+    order_edges = []
+    free_places = sum(free_capacities.values())
+    for order_node, order in enumerate(orders):
+        if not free_places:
+            break
+        for restaurant, distance in orders_restaurants[order.id]:
+            order_edges.append((order, restaurant, distance, order_node, len(flow_network.graph[order_node])))
+            flow_network.add_edge(order_node, restaurant_nodes[restaurant.id], 1, round(distance * 1000))
+        flow_network.add_source(order_node)
+        free_places -= flow_network.augment(order_node, sink)
+
+    assignments = {}
+    cost = 0
+    for order, restaurant, distance, order_node, edge_index in order_edges:
+        if flow_network.graph[order_node][edge_index][1] == 0:
+            assignments[order.id] = restaurant
+            cost += distance
+    solve_time = time.perf_counter() - started_at
+    return AssignmentPlan(assignments, cost, greedy_assignments, greedy_cost, solve_time)
+
+
+def apply_plan(orders, plan):
+    now = timezone.now()
+    assigned_orders = []
+    for order in orders:
+        if order.id in plan.assignments:
+            order.cooking_restaurant = plan.assignments[order.id]
+            order.updated_at = now
+            assigned_orders.append(order)
+    Order.objects.bulk_update(assigned_orders, ['cooking_restaurant', 'updated_at'])
+    return assigned_orders
@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+import json
+
+import brotli
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+
+SUPPORTED_ENCODINGS = ['br', 'gzip']
+
+
+class JsonPayload:
+    """Сериализованный JSON вместе с заранее сжатыми вариантами для отдачи клиентам.
+
+    last_modified должен расти с каждой новой версией данных хотя бы на
+    секунду: Last-Modified передаётся с точностью до секунды.
+    """
+
+    def __init__(self, data, last_modified=None):
+        self.content = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+        self.encoded_content = {
+            'br': brotli.compress(self.content),
+            'gzip': gzip.compress(self.content, mtime=0),
+        }
+        self.etag = hashlib.md5(self.content).hexdigest()
+        self.last_modified = last_modified or timezone.now()
+
+    def make_response(self, request):
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        etag = quote_etag(f'{self.etag}-{encoding}' if encoding else self.etag)
+        last_modified = int(self.last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(
+                self.encoded_content.get(encoding, self.content),
+                content_type='application/json',
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+
+def choose_encoding(accept_encoding):
+    accepted = {}
+    for coding in accept_encoding.split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.lower()] = quality
+
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
@@ -0,0 +1,68 @@
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from foodcartapp.catalog import invalidate_catalog
+from foodcartapp.indexes import invalidate_capability_index, invalidate_spatial_index
+from foodcartapp.models import (Order, OrderItem, Product, ProductCategory, Restaurant,
+                                RestaurantDistance, RestaurantMenuItem)
+from geolocation.models import Location
+from geolocation.signals import coordinates_updated
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def reset_capability_index(sender, **kwargs):
+    transaction.on_commit(invalidate_capability_index)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def reset_spatial_index(sender, **kwargs):
+    transaction.on_commit(invalidate_spatial_index)
+
+
+@receiver(coordinates_updated, sender=Location)
+def reset_spatial_index_for_locations(sender, locations, **kwargs):
+    # В индексе только рестораны, так что новые координаты адресов доставки его не касаются
+    if Restaurant.objects.filter(location__in=locations).exists():
+        transaction.on_commit(invalidate_spatial_index)
+
+
+@receiver(coordinates_updated, sender=Location)
+def link_restaurant_locations(sender, locations, **kwargs):
+    """Привязывает к новым локациям рестораны, адрес которых раньше не удалось геокодировать."""
+    locations_by_key = {location.normalized_address: location for location in locations}
+    unlinked_restaurants = Restaurant.objects.filter(
+        location__isnull=True,
+        normalized_address__in=locations_by_key,
+    ).exclude(normalized_address='')
+    address_keys = set(unlinked_restaurants.values_list('normalized_address', flat=True))
+    for address_key in address_keys:
+        unlinked_restaurants.filter(normalized_address=address_key).update(location=locations_by_key[address_key])
+    if address_keys:
+        transaction.on_commit(invalidate_spatial_index)
+
+
+@receiver(coordinates_updated, sender=Location)
+def reset_location_distances(sender, locations, **kwargs):
+    RestaurantDistance.objects.filter(
+        models.Q(location__in=locations) | models.Q(restaurant__location__in=locations)
+    ).delete()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def reset_catalog(sender, **kwargs):
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_total_price(sender, instance, **kwargs):
+    Order.objects.filter(pk=instance.order_id).update_total_price(updated_at=timezone.now())
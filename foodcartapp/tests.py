@@ -0,0 +1,343 @@
+import gzip
+import itertools
+import json
+import random
+from collections import Counter
+from types import SimpleNamespace
+from unittest import mock
+
+import brotli
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from foodcartapp.indexes import SPATIAL_INDEX_VERSION_CACHE_KEY, RestaurantCapabilityIndex, get_spatial_index
+from foodcartapp.models import IdempotencyKey, Order, Product, Restaurant, RestaurantMenuItem
+from foodcartapp.optimizer import plan_assignments
+from foodcartapp.payloads import JsonPayload, choose_encoding
+from foodcartapp.views import collect_product_ids
+from geolocation.models import Location
+
+
+class IdempotentOrderTest(TestCase):
+    def setUp(self):
+        product = Product.objects.create(name='Бургер', price=100)
+        restaurant = Restaurant.objects.create(name='Центр', address='Москва, Тверская 1')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+        self.order_data = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79161234567',
+            'address': 'Москва, Арбат 10',
+            'products': [{'product': product.id, 'quantity': 2}],
+        }
+
+    def post_order(self, key='checkout-1'):
+        return self.client.post(
+            '/api/order/',
+            json.dumps(self.order_data),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_repeat_gets_stored_response(self):
+        first_response = self.post_order()
+        repeat_response = self.post_order()
+
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(repeat_response.content, first_response.content)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_duplicate_while_first_in_progress(self):
+        duplicate_responses = []
+
+        def create_order_with_duplicate(order_fields, products_fields):
+            # Повтор приходит, пока первый запрос ещё сохраняет заказ
+            duplicate_responses.append(self.post_order())
+            return Order.objects.create(**order_fields)
+
+        with mock.patch('foodcartapp.views.create_order', side_effect=create_order_with_duplicate):
+            response = self.post_order()
+
+        [duplicate_response] = duplicate_responses
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(duplicate_response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_duplicate_after_first_failed_claims_key_again(self):
+        create_key = IdempotencyKey.objects.create
+        create_key_calls = []
+
+        def create_key_after_first_failed(**fields):
+            # Первая попытка натыкается на запись запроса, который затем упал и удалил её
+            create_key_calls.append(fields)
+            if len(create_key_calls) == 1:
+                raise IntegrityError
+            return create_key(**fields)
+
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=create_key_after_first_failed):
+            response = self.post_order()
+        repeat_response = self.post_order()
+
+        self.assertEqual(len(create_key_calls), 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+        self.assertEqual(repeat_response.content, response.content)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+def plan_by_brute_force(orders, orders_restaurants, free_capacities):
+    """Перебирает все распределения и выбирает то, что выбрал бы plan_assignments.
+
+    Сначала как можно больше мест получают заказы, идущие в списке раньше,
+    затем среди таких распределений выбирается самое короткое.
+    """
+    best_key, best_cost = None, None
+    choices = [[None, *orders_restaurants[order.id]] for order in orders]
+    for assignment in itertools.product(*choices):
+        loads = Counter(choice[0].id for choice in assignment if choice)
+        if any(load > free_capacities[restaurant_id] for restaurant_id, load in loads.items()):
+            continue
+        cost = sum(choice[1] for choice in assignment if choice)
+        key = (tuple(choice is not None for choice in assignment), -cost)
+        if best_key is None or key > best_key:
+            best_key, best_cost = key, cost
+    return best_key[0], best_cost
+
+
+class OrdersBatchTest(TestCase):
+    def test_collect_product_ids_parses_like_serializer(self):
+        orders_data = [
+            {'products': [{'product': 1}, {'product': '2'}, {'product': '3.0'}, {'product': ' 4 '}]},
+            {'products': [{'product': 'бургер'}, {'product': None}, {'quantity': 1}, 5]},
+            {'products': 'не список'},
+            'не заказ',
+        ]
+
+        self.assertEqual(collect_product_ids(orders_data), {1, 2, 3, 4})
+
+    def test_product_id_with_decimal_point_is_accepted(self):
+        product = Product.objects.create(name='Бургер', price=100)
+        restaurant = Restaurant.objects.create(name='Центр', address='Москва, Тверская 1')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+        order_data = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79161234567',
+            'address': 'Москва, Арбат 10',
+            'products': [{'product': f'{product.id}.0', 'quantity': 2}],
+        }
+
+        response = self.client.post('/api/order/batch/', json.dumps([order_data]), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        [result] = response.json()
+        self.assertNotIn('errors', result)
+        self.assertEqual(Order.objects.get().items.get().product, product)
+
+
+class PlanAssignmentsTest(SimpleTestCase):
+    def plan(self, orders, orders_restaurants, free_capacities):
+        with mock.patch('foodcartapp.optimizer.rank_restaurants', return_value=orders_restaurants), \
+                mock.patch('foodcartapp.optimizer.get_free_capacities', return_value=free_capacities):
+            return plan_assignments(orders)
+
+    def test_full_restaurant_gets_no_more_orders(self):
+        center, south = SimpleNamespace(id=1), SimpleNamespace(id=2)
+        orders = [SimpleNamespace(id=1), SimpleNamespace(id=2)]
+        orders_restaurants = {
+            1: [(center, 1), (south, 2)],
+            2: [(center, 1), (south, 10)],
+        }
+
+        plan = self.plan(orders, orders_restaurants, {center.id: 1, south.id: 1})
+
+        # Жадный выбор отдал бы центру первый заказ, и второй поехал бы за 10 км
+        self.assertEqual(plan.greedy_cost, 11)
+        self.assertEqual(plan.assignments, {1: south, 2: center})
+        self.assertEqual(plan.cost, 3)
+
+    def test_matches_brute_force(self):
+        for seed in range(300):
+            randomizer = random.Random(seed)
+            restaurants = [SimpleNamespace(id=restaurant_id) for restaurant_id in range(randomizer.randint(1, 3))]
+            orders = [SimpleNamespace(id=order_id) for order_id in range(randomizer.randint(1, 5))]
+            orders_restaurants = {
+                order.id: sorted(
+                    [
+                        (restaurant, randomizer.randint(1, 20))
+                        for restaurant in restaurants
+                        if randomizer.random() < 0.8
+                    ],
+                    key=lambda restaurant_with_distance: restaurant_with_distance[1],
+                )
+                for order in orders
+            }
+            free_capacities = {restaurant.id: randomizer.randint(0, 2) for restaurant in restaurants}
+
+            plan = self.plan(orders, orders_restaurants, free_capacities)
+
+            with self.subTest(seed=seed):
+                expected_assigned, expected_cost = plan_by_brute_force(orders, orders_restaurants, free_capacities)
+                self.assertEqual(tuple(order.id in plan.assignments for order in orders), expected_assigned)
+                self.assertEqual(plan.cost, expected_cost)
+                loads = Counter(restaurant.id for restaurant in plan.assignments.values())
+                for restaurant_id, load in loads.items():
+                    self.assertLessEqual(load, free_capacities[restaurant_id])
+                for order_id, restaurant in plan.assignments.items():
+                    self.assertIn(restaurant, [candidate for candidate, _ in orders_restaurants[order_id]])
+
+
+class RestaurantCapabilityIndexTest(SimpleTestCase):
+    def setUp(self):
+        # (ресторан, продукт): в ресторане 10 есть продукты 1 и 2, в 20 — 1 и 3, в 30 — только 2
+        self.index = RestaurantCapabilityIndex([(10, 1), (10, 2), (20, 1), (20, 3), (30, 2)])
+
+    def test_restaurants_with_all_products(self):
+        cases = [
+            ([1], [10, 20]),
+            ([2], [10, 30]),
+            ([1, 2], [10]),
+            ([1, 3], [20]),
+            ([2, 3], []),
+            ([1, 1, 2], [10]),
+            ([4], []),
+            ([1, 4], []),
+        ]
+        for product_ids, restaurant_ids in cases:
+            with self.subTest(product_ids=product_ids):
+                self.assertEqual(self.index.get_restaurant_ids(product_ids), restaurant_ids)
+
+    def test_order_without_products_fits_nowhere(self):
+        self.assertEqual(self.index.get_mask([]), 0)
+        self.assertEqual(self.index.get_restaurant_ids([]), [])
+
+    def test_predicate_matches_restaurant_ids(self):
+        for product_ids in [[1], [2], [1, 2], [1, 3], [4]]:
+            predicate = self.index.get_predicate(product_ids)
+            with self.subTest(product_ids=product_ids):
+                self.assertEqual(
+                    [restaurant_id for restaurant_id in [10, 20, 30, 40] if predicate(restaurant_id)],
+                    self.index.get_restaurant_ids(product_ids),
+                )
+
+
+class CatalogValidatorsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(name='Центр', address='Москва, Тверская 1')
+        self.product = Product.objects.create(name='Бургер', price=100, image='burger.jpg')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.product)
+
+    def test_catalog_change_in_the_same_second_is_not_modified(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(
+            self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+            304,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 120
+            self.product.save()
+        changed_response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEqual(changed_response.status_code, 200)
+        self.assertNotEqual(changed_response['ETag'], response['ETag'])
+        self.assertNotEqual(changed_response['Last-Modified'], response['Last-Modified'])
+
+
+class ChooseEncodingTest(SimpleTestCase):
+    def test_choose_encoding(self):
+        cases = [
+            ('', None),
+            ('identity', None),
+            ('gzip', 'gzip'),
+            ('gzip, deflate, br', 'br'),
+            ('BR', 'br'),
+            ('br;q=0, gzip', 'gzip'),
+            ('br;q=0.5, gzip;q=1', 'br'),
+            ('br;q=0, gzip;q=0', None),
+            ('br;q=abc, gzip', 'gzip'),
+            ('*', 'br'),
+            ('*;q=0', None),
+            ('*, br;q=0', 'gzip'),
+        ]
+        for accept_encoding, encoding in cases:
+            with self.subTest(accept_encoding=accept_encoding):
+                self.assertEqual(choose_encoding(accept_encoding), encoding)
+
+
+class JsonPayloadTest(SimpleTestCase):
+    def setUp(self):
+        self.payload = JsonPayload([{'name': 'Бургер', 'price': 100}])
+        self.request_factory = RequestFactory()
+
+    def get(self, **headers):
+        return self.payload.make_response(self.request_factory.get('/', **headers))
+
+    def test_encoded_variants_decode_to_the_same_content(self):
+        plain = self.get()
+        compressed = {
+            'br': self.get(HTTP_ACCEPT_ENCODING='br'),
+            'gzip': self.get(HTTP_ACCEPT_ENCODING='gzip'),
+        }
+
+        self.assertEqual(json.loads(plain.content), [{'name': 'Бургер', 'price': 100}])
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(brotli.decompress(compressed['br'].content), plain.content)
+        self.assertEqual(gzip.decompress(compressed['gzip'].content), plain.content)
+        for encoding, response in compressed.items():
+            with self.subTest(encoding=encoding):
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertIn('Accept-Encoding', response['Vary'])
+        # У каждого варианта свой ETag, иначе кеш мог бы отдать сжатый ответ клиенту без поддержки сжатия
+        self.assertEqual(len({plain['ETag'], compressed['br']['ETag'], compressed['gzip']['ETag']}), 3)
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class SpatialIndexInvalidationTest(TestCase):
+    def test_only_restaurant_locations_reset_index(self):
+        cache.clear()
+        restaurant_location = Location.objects.create(
+            raw_address='Москва, Тверская 1',
+            latitude=55.757,
+            longitude=37.613,
+        )
+        restaurant = Restaurant.objects.create(name='Центр', address='Москва, Тверская 1', location=restaurant_location)
+        self.assertEqual([key for key, _ in get_spatial_index().nearest(55.75, 37.6)], [restaurant.id])
+        version = cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(raw_address='Москва, Арбат 10', latitude=55.751, longitude=37.59)
+        self.assertEqual(cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant_location.latitude = 55.758
+            restaurant_location.save()
+        self.assertIsNone(cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY))
+
+    def test_new_location_links_restaurants_with_same_address(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(name='Центр', address='г. Москва, ул. Тверская, д. 1')
+        other_restaurant = Restaurant.objects.create(name='Арбат', address='Москва, Арбат 10')
+        get_spatial_index()
+        version = cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(raw_address='Москва, улица Тверская 1')
+        self.assertEqual(cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location.latitude, location.longitude = 55.757, 37.613
+            location.save()
+
+        restaurant.refresh_from_db()
+        other_restaurant.refresh_from_db()
+        self.assertEqual(restaurant.location, location)
+        self.assertIsNone(other_restaurant.location)
+        self.assertIsNone(cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY))
@@ -1,17 +1,24 @@
-from django.db import transaction
-from django.http import JsonResponse
+from functools import lru_cache
+
 from django.templatetags.static import static
-from rest_framework import serializers
+from rest_framework import serializers, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from foodcartapp.catalog import get_catalog
+from foodcartapp.idempotency import idempotent
+from foodcartapp.intake import create_order, create_orders, journal_orders
+from foodcartapp.journal import get_order_journal
 from foodcartapp.models import Order, OrderItem, Product
-from geolocation.models import Location
+from foodcartapp.payloads import JsonPayload
 
+ORDERS_BATCH_LIMIT = 500
 
-def banners_list_api(request):
+
+@lru_cache(maxsize=None)
+def get_banners():
     # FIXME move data to db?
-    return JsonResponse([
+    return JsonPayload([
         {
             'title': 'Burger',
             'src': static('burger.jpg'),
@@ -27,44 +34,53 @@ def banners_list_api(request):
             'src': static('tasty.jpg'),
             'text': 'Food is incomplete without a tasty dessert',
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    ])
+
+
+def banners_list_api(request):
+    return get_banners().make_response(request)
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return get_catalog().make_response(request)
+
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    """Проверяет товары всех позиций заказа одним запросом к базе.
+
+    Если товары уже загружены, например для пачки заказов, их можно передать
+    в контексте сериализатора под ключом products.
+    """
+
+    def to_internal_value(self, data):
+        order_items = super().to_internal_value(data)
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.available().in_bulk(
+                {order_item['product'] for order_item in order_items}
+            )
+        does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+
+        errors = []
+        for order_item in order_items:
+            product = products.get(order_item['product'])
+            if product:
+                order_item['product'] = product
+                errors.append({})
+            else:
+                errors.append({'product': [does_not_exist.format(pk_value=order_item['product'])]})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return order_items
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = serializers.IntegerField()
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity']
+        list_serializer_class = OrderItemListSerializer
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -81,23 +97,88 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
 
-@transaction.atomic
+@idempotent
 @api_view(['POST'])
 def register_order(request):
     serializer = OrderSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    new_order = Order.objects.create(
-        firstname=serializer.validated_data['firstname'],
-        lastname=serializer.validated_data['lastname'],
-        phonenumber=serializer.validated_data['phonenumber'],
-        address=serializer.validated_data['address']
-    )
-    location, created = Location.objects.get_or_create(raw_address=serializer.validated_data['address'])
-    if created:
-        location.process_coordinates()
-    products_fields = serializer.validated_data['products']
-    order_items = [
-        OrderItem(order=new_order, price=fields['product'].price, **fields) for fields in products_fields
-    ]
-    OrderItem.objects.bulk_create(order_items)
+    order_fields = dict(serializer.validated_data)
+    products_fields = order_fields.pop('products')
+
+    journal = get_order_journal()
+    if journal:
+        # Заказ ещё не в базе: клиент получает предварительный номер, а заказ перенесёт flush_order_journal
+        [journal_id] = journal_orders(journal, [(order_fields, products_fields)])
+        return Response(
+            {'provisional_id': str(journal_id), **OrderSerializer(Order(**order_fields)).data},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    new_order = create_order(order_fields, products_fields)
     return Response(OrderSerializer(new_order).data)
+
+
+def collect_product_ids(orders_data):
+    """Собирает id товаров из ещё не проверенных данных заказов, пропуская всё некорректное."""
+    # Id разбирается тем же полем, что и при проверке заказа, иначе «1.0» не попадёт в выборку
+    product_field = OrderItemSerializer().fields['product']
+    product_ids = set()
+    for order_data in orders_data:
+        products_data = order_data.get('products') if isinstance(order_data, dict) else None
+        if not isinstance(products_data, list):
+            continue
+        for product_data in products_data:
+            try:
+                product_ids.add(product_field.to_internal_value(product_data['product']))
+            except (TypeError, KeyError, serializers.ValidationError):
+                continue
+    return product_ids
+
+
+@idempotent
+@api_view(['POST'])
+def register_orders_batch(request):
+    """Принимает массив заказов, каждый в формате register_order.
+
+    Заказы проверяются и сохраняются независимо: в ответе для каждого
+    заказа либо его данные с id, либо ошибки проверки.
+    """
+    orders_data = request.data
+    if not isinstance(orders_data, list) or not orders_data:
+        return Response({'error': 'Ожидается непустой список заказов'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(orders_data) > ORDERS_BATCH_LIMIT:
+        return Response(
+            {'error': f'За один запрос можно передать не больше {ORDERS_BATCH_LIMIT} заказов'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    products = Product.objects.available().in_bulk(collect_product_ids(orders_data))
+    order_serializers = [
+        OrderSerializer(data=order_data, context={'products': products})
+        for order_data in orders_data
+    ]
+    valid_serializers = [serializer for serializer in order_serializers if serializer.is_valid()]
+    orders_fields = []
+    for serializer in valid_serializers:
+        order_fields = dict(serializer.validated_data)
+        products_fields = order_fields.pop('products')
+        orders_fields.append((order_fields, products_fields))
+
+    journal = get_order_journal()
+    if journal:
+        journal_ids = iter(journal_orders(journal, orders_fields))
+        new_orders = iter(Order(**order_fields) for order_fields, _ in orders_fields)
+    else:
+        new_orders = iter(create_orders(orders_fields))
+
+    results = []
+    for serializer in order_serializers:
+        if serializer.errors:
+            results.append({'errors': serializer.errors})
+            continue
+        new_order = next(new_orders)
+        if journal:
+            results.append({'provisional_id': str(next(journal_ids)), **OrderSerializer(new_order).data})
+        else:
+            results.append({'id': new_order.id, **OrderSerializer(new_order).data})
+    return Response(results, status=status.HTTP_202_ACCEPTED if journal else status.HTTP_200_OK)
@@ -0,0 +1,33 @@
+import re
+
+ADDRESS_TOKEN_PATTERN = re.compile(r'\w+(?:-\w+)*')
+
+ADDRESS_ABBREVIATIONS = {
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+}
+
+# Слова, которые ничего не добавляют к адресу: «г. Москва» и «Москва» — одно и то же
+ADDRESS_NOISE_WORDS = {'г', 'город', 'д', 'дом'}
+
+
+def normalize_address(address):
+    """Приводит адрес к ключу, по которому совпадают разные написания одного адреса.
+
+    Регистр, буква «ё», пунктуация и лишние пробелы не учитываются, частые
+    сокращения вроде «ул.» заменяются полными словами.
+    """
+    tokens = ADDRESS_TOKEN_PATTERN.findall(address.casefold().replace('ё', 'е'))
+    tokens = [ADDRESS_ABBREVIATIONS.get(token, token) for token in tokens]
+    return ' '.join(token for token in tokens if token not in ADDRESS_NOISE_WORDS)
@@ -1,6 +1,24 @@
 from django.contrib import admin
 
-from geolocation.models import Location
+from geolocation.models import GeocodingJob, Location
+
+
+class GeocodingFailureFilter(admin.SimpleListFilter):
+    title = 'геокодирование'
+    parameter_name = 'geocoding'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('failing', 'Не найдены геокодером'),
+            ('due', 'Ждут геокодирования'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'failing':
+            return queryset.failing()
+        if self.value() == 'due':
+            return queryset.needs_geocoding().due_for_geocoding()
+        return queryset
 
 
 @admin.register(Location)
@@ -10,4 +28,18 @@ class LocationAdmin(admin.ModelAdmin):
         'latitude',
         'longitude',
         'updated_at',
+        'failures_count',
+        'next_retry_at',
+    ]
+    list_filter = [
+        GeocodingFailureFilter,
+    ]
+
+
+@admin.register(GeocodingJob)
+class GeocodingJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'raw_address',
+        'created_at',
+        'locked_until',
     ]
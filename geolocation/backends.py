@@ -0,0 +1,140 @@
+import abc
+import csv
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeopyError
+from geopy.geocoders import Yandex
+
+from geolocation.addresses import normalize_address
+
+
+class RateLimiter:
+    """Не даёт потокам вызывать геокодер чаще rate раз в секунду."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_call_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            call_at = max(self.next_call_at, time.monotonic())
+            self.next_call_at = call_at + self.interval
+        time.sleep(max(call_at - time.monotonic(), 0))
+
+
+class GeocoderBackend(abc.ABC):
+    """Бэкенд геокодера: по адресу возвращает пару (широта, долгота).
+
+    Если адрес не найден, возвращает None. Ошибки геокодера — исключения geopy.
+    """
+
+    @abc.abstractmethod
+    def geocode(self, address):
+        pass
+
+
+class YandexBackend(GeocoderBackend):
+    def __init__(self, api_key=None, timeout=None):
+        self.geocoder = Yandex(
+            api_key=api_key or settings.YANDEX_API_KEY,
+            timeout=timeout or settings.GEOCODER_TIMEOUT,
+        )
+
+    def geocode(self, address):
+        location = self.geocoder.geocode(address)
+        if not location:
+            return None
+        return location.latitude, location.longitude
+
+
+class GazetteerBackend(GeocoderBackend):
+    """Геокодер без сети: ищет адреса в CSV-файле с колонками address, latitude, longitude.
+
+    Нужен для нагрузочных тестов и CI, где к Яндексу обращаться нельзя.
+    """
+
+    def __init__(self, path=None):
+        with open(path or settings.GEOCODER_GAZETTEER_PATH, encoding='utf-8') as gazetteer_file:
+            self.coordinates = {
+                normalize_address(row['address']): (float(row['latitude']), float(row['longitude']))
+                for row in csv.DictReader(gazetteer_file)
+            }
+
+    def geocode(self, address):
+        return self.coordinates.get(normalize_address(address))
+
+
+class ResilientBackend(GeocoderBackend):
+    """Обёртка над бэкендом с повторами и предохранителем.
+
+    Таймауты и недоступность геокодера повторяются с растущей паузой. После
+    failure_threshold неудачных вызовов подряд предохранитель размыкается, и
+    recovery_timeout секунд вызовы сразу падают с GeocoderUnavailable, не
+    дожидаясь геокодера. Затем пропускается один пробный вызов.
+    """
+
+    retry_errors = (GeocoderTimedOut, GeocoderUnavailable)
+
+    def __init__(self, backend, retries=2, backoff=0.5, failure_threshold=5, recovery_timeout=30):
+        self.backend = backend
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures_count = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        self._check_circuit()
+        for attempt in range(self.retries + 1):
+            try:
+                coordinates = self.backend.geocode(address)
+            except self.retry_errors:
+                if attempt == self.retries:
+                    self._record_failure()
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+            except GeopyError:
+                self._record_failure()
+                raise
+            else:
+                self._record_success()
+                return coordinates
+
+    def _check_circuit(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                raise GeocoderUnavailable('Геокодер недоступен, запросы временно не отправляются')
+            # Пробный вызов: пока он идёт, остальные по-прежнему падают сразу
+            self.opened_at = time.monotonic()
+
+    def _record_failure(self):
+        with self._lock:
+            self.failures_count += 1
+            if self.failures_count >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def _record_success(self):
+        with self._lock:
+            self.failures_count = 0
+            self.opened_at = None
+
+
+@lru_cache(maxsize=None)
+def get_geocoder():
+    """Возвращает бэкенд из настройки GEOCODER_BACKEND, общий для всего процесса."""
+    backend_class = import_string(settings.GEOCODER_BACKEND)
+    return ResilientBackend(
+        backend_class(),
+        retries=settings.GEOCODER_RETRIES,
+        failure_threshold=settings.GEOCODER_FAILURE_THRESHOLD,
+        recovery_timeout=settings.GEOCODER_RECOVERY_TIMEOUT,
+    )
@@ -0,0 +1,29 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def get_distance_matrix(origins, destinations):
+    """Считает расстояния в км от каждой точки origins до каждой точки destinations.
+
+    Точки передаются парами (широта, долгота). Вместо неизвестных координат
+    можно передать None, тогда в соответствующих ячейках будет nan.
+    """
+    origins = _to_radians(origins)
+    destinations = _to_radians(destinations)
+
+    origins_lat = origins[:, 0, np.newaxis]
+    origins_lon = origins[:, 1, np.newaxis]
+    destinations_lat = destinations[np.newaxis, :, 0]
+    destinations_lon = destinations[np.newaxis, :, 1]
+
+    haversine = (
+        np.sin((destinations_lat - origins_lat) / 2) ** 2
+        + np.cos(origins_lat) * np.cos(destinations_lat) * np.sin((destinations_lon - origins_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
+
+def _to_radians(points):
+    coordinates = [point if point else (np.nan, np.nan) for point in points]
+    return np.radians(np.array(coordinates, dtype=float).reshape(-1, 2))
@@ -0,0 +1,41 @@
+import time
+import traceback
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from geopy.exc import GeopyError
+
+from geolocation.models import GeocodingJob
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь геокодирования адресов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Сколько задач брать за один проход')
+        parser.add_argument('--sleep', type=float, default=5, help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument('--lease', type=int, default=60, help='На сколько секунд воркер занимает задачу')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь один раз и завершиться')
+
+    def handle(self, *args, **options):
+        lease = timedelta(seconds=options['lease'])
+        while True:
+            jobs = list(GeocodingJob.objects.unlocked()[:options['batch_size']])
+            for job in jobs:
+                if not GeocodingJob.objects.claim(job, lease):
+                    continue
+                try:
+                    location = job.process()
+                except GeopyError as error:
+                    self.stderr.write(f'{job.raw_address}: {error}')
+                    continue
+                except Exception:
+                    # Одна сломанная задача не должна останавливать очередь. Она останется
+                    # занятой до конца аренды, и после этого её попробуют обработать снова
+                    self.stderr.write(f'{job.raw_address}: {traceback.format_exc()}')
+                    continue
+                self.stdout.write(f'{location.raw_address}: {location.latitude} {location.longitude}')
+            if options['once'] and not jobs:
+                return
+            if not jobs:
+                time.sleep(options['sleep'])
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0004_auto_20230211_1719'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('raw_address', models.CharField(max_length=255, unique=True, verbose_name='Адрес')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата постановки в очередь')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Занята до')),
+            ],
+            options={
+                'verbose_name': 'Задача геокодирования',
+                'verbose_name_plural': 'Очередь геокодирования',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0005_geocodingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='normalized_address',
+            field=models.CharField(editable=False, max_length=1024, null=True, verbose_name='Нормализованный адрес'),
+        ),
+    ]
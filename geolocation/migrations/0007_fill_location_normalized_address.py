@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:43
+
+import re
+
+from django.db import migrations
+
+# Копия geolocation.addresses.normalize_address на момент миграции: миграция
+# должна давать тот же результат, даже если нормализация потом изменится
+ADDRESS_TOKEN_PATTERN = re.compile(r'\w+(?:-\w+)*')
+
+ADDRESS_ABBREVIATIONS = {
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+}
+
+ADDRESS_NOISE_WORDS = {'г', 'город', 'д', 'дом'}
+
+
+def normalize_address(address):
+    tokens = ADDRESS_TOKEN_PATTERN.findall(address.casefold().replace('ё', 'е'))
+    tokens = [ADDRESS_ABBREVIATIONS.get(token, token) for token in tokens]
+    return ' '.join(token for token in tokens if token not in ADDRESS_NOISE_WORDS)
+
+
+def merge_locations(apps, schema_editor):
+    Location = apps.get_model('geolocation', 'Location')
+    locations_by_key = {}
+    for location in Location.objects.all():
+        locations_by_key.setdefault(normalize_address(location.raw_address), []).append(location)
+
+    for address_key, locations in locations_by_key.items():
+        # Из дублей остаётся самая свежая локация с координатами
+        location, *duplicates = sorted(
+            locations,
+            key=lambda location: (location.latitude is not None, location.updated_at),
+            reverse=True,
+        )
+        Location.objects.filter(pk__in=[duplicate.pk for duplicate in duplicates]).delete()
+        location.normalized_address = address_key
+        location.save(update_fields=['normalized_address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0006_location_normalized_address'),
+        # Удаление дублей каскадом удаляет и их расстояния до ресторанов
+        ('foodcartapp', '0053_restaurantdistance'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_locations, migrations.RunPython.noop),
+    ]
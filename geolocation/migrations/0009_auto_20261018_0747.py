@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0008_alter_location_normalized_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='failures_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Неудачных попыток геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Следующая попытка геокодирования'),
+        ),
+    ]
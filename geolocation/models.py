@@ -1,7 +1,98 @@
-from django.conf import settings
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
-from geopy.geocoders import Yandex
+from geopy.exc import GeopyError
+
+from geolocation.addresses import normalize_address
+from geolocation.backends import get_geocoder
+from geolocation.signals import coordinates_updated
+
+GEOCODING_RETRY_DELAY = timedelta(hours=1)
+GEOCODING_MAX_RETRY_DELAY = timedelta(days=7)
+GEOCODED_FIELDS = ['latitude', 'longitude', 'updated_at', 'failures_count', 'next_retry_at']
+
+
+class LocationQuerySet(models.QuerySet):
+    def get_locations(self, addresses, geocode_missing=False):
+        """Возвращает словарь адрес → локация для известных адресов.
+
+        Адреса сравниваются по нормализованному ключу, так что разные написания
+        одного адреса получают одну и ту же локацию. Адреса, которые геокодер
+        не нашёл, повторно геокодируются только когда подойдёт их очередь.
+        """
+        address_keys = {address: normalize_address(address) for address in addresses}
+        locations = {
+            location.normalized_address: location
+            for location in self.filter(normalized_address__in=address_keys.values())
+        }
+        if geocode_missing:
+            geocoded_locations = []
+            for address, address_key in address_keys.items():
+                location = locations.get(address_key)
+                if location and not location.is_geocoding_due():
+                    continue
+                location = location or Location(raw_address=address, normalized_address=address_key)
+                try:
+                    location.process_coordinates()
+                except GeopyError:
+                    # Адрес попробуем геокодировать в следующий раз
+                    continue
+                geocoded_locations.append(location)
+            locations.update(
+                (location.normalized_address, location)
+                for location in self.save_geocoded(geocoded_locations)
+            )
+        return {
+            address: locations[address_key]
+            for address, address_key in address_keys.items()
+            if address_key in locations
+        }
+
+    def save_geocoded(self, locations):
+        """Сохраняет результаты геокодирования: новые локации создаёт, остальные обновляет.
+
+        Возвращает сохранённые локации.
+        """
+        if not locations:
+            return []
+        changed_keys = {location.normalized_address for location in locations if location.has_new_coordinates()}
+        updated_locations = [location for location in locations if location.pk]
+        new_locations = [location for location in locations if not location.pk]
+        self.bulk_update(updated_locations, GEOCODED_FIELDS)
+        self.bulk_create(new_locations, ignore_conflicts=True)
+        for location in updated_locations:
+            location.remember_saved_coordinates()
+        # Не все базы возвращают id из bulk_create, поэтому новые локации перечитываются
+        saved_locations = updated_locations + list(
+            self.filter(normalized_address__in=[location.normalized_address for location in new_locations])
+        )
+        changed_locations = [location for location in saved_locations if location.normalized_address in changed_keys]
+        if changed_locations:
+            coordinates_updated.send(sender=Location, locations=changed_locations)
+        return saved_locations
+
+    def needs_geocoding(self, stale_before=None):
+        """Локации без координат, а если указан stale_before — ещё и обновлённые раньше этого момента."""
+        condition = models.Q(latitude__isnull=True) | models.Q(longitude__isnull=True)
+        if stale_before:
+            condition |= models.Q(updated_at__lt=stale_before)
+        return self.filter(condition)
+
+    def due_for_geocoding(self):
+        """Исключает адреса, которые геокодер не нашёл и время повторной попытки ещё не пришло."""
+        return self.filter(models.Q(next_retry_at__isnull=True) | models.Q(next_retry_at__lte=timezone.now()))
+
+    def failing(self):
+        return self.filter(failures_count__gt=0, latitude__isnull=True)
+
+    def get_coordinates(self, addresses, geocode_missing=False):
+        """Возвращает словарь адрес → (широта, долгота) для известных адресов."""
+        return {
+            address: location.coordinates
+            for address, location in self.get_locations(addresses, geocode_missing).items()
+            if location.coordinates
+        }
 
 
 class Location(models.Model):
@@ -11,6 +102,14 @@ class Location(models.Model):
         db_index=True,
         unique=True,
     )
+    # Раскрытие сокращений удлиняет адрес: «к.» превращается в «корпус», так что ключ
+    # может быть в три с половиной раза длиннее исходного адреса
+    normalized_address = models.CharField(
+        verbose_name='Нормализованный адрес',
+        max_length=1024,
+        unique=True,
+        editable=False,
+    )
 
     latitude = models.DecimalField(
         verbose_name='Широта',
@@ -31,20 +130,148 @@ class Location(models.Model):
         editable=False,
         default=timezone.now
     )
+    failures_count = models.PositiveIntegerField(
+        verbose_name='Неудачных попыток геокодирования',
+        default=0,
+        editable=False,
+    )
+    next_retry_at = models.DateTimeField(
+        verbose_name='Следующая попытка геокодирования',
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
+
+    objects = LocationQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Локация'
         verbose_name_plural = 'Локации'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        location = super().from_db(db, field_names, values)
+        location.remember_saved_coordinates()
+        return location
+
+    @property
+    def coordinates(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
+
+    def get_stored_coordinates(self):
+        """Координаты с той точностью, с какой их хранит база. Отложенные поля не загружаются."""
+        latitude, longitude = self.__dict__.get('latitude'), self.__dict__.get('longitude')
+        if latitude is None or longitude is None:
+            return None
+        return round(float(latitude), 6), round(float(longitude), 6)
+
+    def remember_saved_coordinates(self):
+        self._saved_coordinates = self.get_stored_coordinates()
+
+    def has_new_coordinates(self):
+        """Отличаются ли координаты от сохранённых в базе. У новой локации — есть ли они вообще."""
+        return self.get_stored_coordinates() != getattr(self, '_saved_coordinates', None)
+
     def process_coordinates(self):
-        geocoder = Yandex(api_key=settings.YANDEX_API_KEY)
-        try:
-            _, coordinates = geocoder.geocode(self.raw_address)
-        except TypeError:
-            coordinates = None
-        if coordinates:
-            self.latitude, self.longitude = coordinates
-            self.updated_at = timezone.now()
+        """Геокодирует адрес. Возвращает True, если координаты нашлись."""
+        coordinates = get_geocoder().geocode(self.raw_address)
+        if not coordinates:
+            self.record_geocoding_failure()
+            return False
+        self.latitude, self.longitude = coordinates
+        self.updated_at = timezone.now()
+        self.failures_count = 0
+        self.next_retry_at = None
+        return True
+
+    def record_geocoding_failure(self):
+        """Откладывает следующую попытку, каждый раз вдвое дольше, но не больше чем на неделю."""
+        self.failures_count += 1
+        retry_delay = GEOCODING_RETRY_DELAY * 2 ** min(self.failures_count - 1, 16)
+        self.next_retry_at = timezone.now() + min(retry_delay, GEOCODING_MAX_RETRY_DELAY)
+
+    def is_geocoding_due(self):
+        """Нужно ли геокодировать адрес без координат прямо сейчас."""
+        if self.coordinates:
+            return False
+        return self.next_retry_at is None or self.next_retry_at <= timezone.now()
+
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.raw_address)
+        has_new_coordinates = self.has_new_coordinates()
+        super().save(*args, **kwargs)
+        self.remember_saved_coordinates()
+        if has_new_coordinates:
+            coordinates_updated.send(sender=Location, locations=[self])
 
     def __str__(self):
         return f"{self.raw_address} {self.latitude} {self.longitude} {self.updated_at}"
+
+
+class GeocodingJobQuerySet(models.QuerySet):
+    def enqueue(self, address):
+        self.enqueue_many([address])
+
+    def enqueue_many(self, addresses):
+        """Ставит в очередь адреса, которые ещё не геокодированы и не ждут повторной попытки."""
+        locations = Location.objects.get_locations(addresses)
+        jobs = [
+            GeocodingJob(raw_address=address)
+            for address in set(addresses)
+            if address not in locations or locations[address].is_geocoding_due()
+        ]
+        self.bulk_create(jobs, ignore_conflicts=True)
+
+    def unlocked(self):
+        return self.filter(
+            models.Q(locked_until__isnull=True) | models.Q(locked_until__lt=timezone.now())
+        )
+
+    def claim(self, job, lease):
+        """Помечает задачу занятой, чтобы её не взял параллельный воркер."""
+        locked_until = timezone.now() + lease
+        claimed = self.unlocked().filter(pk=job.pk).update(locked_until=locked_until)
+        job.locked_until = locked_until
+        return bool(claimed)
+
+
+class GeocodingJob(models.Model):
+    raw_address = models.CharField(
+        verbose_name='Адрес',
+        max_length=255,
+        unique=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата постановки в очередь',
+        default=timezone.now,
+        db_index=True,
+    )
+    locked_until = models.DateTimeField(
+        verbose_name='Занята до',
+        null=True,
+        blank=True,
+    )
+
+    objects = GeocodingJobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Задача геокодирования'
+        verbose_name_plural = 'Очередь геокодирования'
+        ordering = ['created_at']
+
+    def process(self):
+        location, _ = Location.objects.get_or_create(
+            normalized_address=normalize_address(self.raw_address),
+            defaults={'raw_address': self.raw_address},
+        )
+        if location.is_geocoding_due():
+            location.process_coordinates()
+            location.save()
+        self.delete()
+        return location
+
+    def __str__(self):
+        return f"{self.raw_address} {self.created_at}"
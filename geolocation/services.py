@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.dispatch import receiver
+
+from geolocation.addresses import normalize_address
+from geolocation.models import Location
+from geolocation.signals import coordinates_updated
+
+
+class LocationCache:
+    """Ограниченный по размеру LRU-кэш локаций, записи которого устаревают через ttl секунд."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._locations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, address_key):
+        with self._lock:
+            cached = self._locations.get(address_key)
+            if cached is None:
+                return None
+            expires_at, location = cached
+            if expires_at < time.monotonic():
+                del self._locations[address_key]
+                return None
+            self._locations.move_to_end(address_key)
+            return location
+
+    def set(self, address_key, location):
+        with self._lock:
+            self._locations[address_key] = (time.monotonic() + self.ttl, location)
+            self._locations.move_to_end(address_key)
+            while len(self._locations) > self.max_size:
+                self._locations.popitem(last=False)
+
+    def delete(self, address_key):
+        with self._lock:
+            self._locations.pop(address_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._locations.clear()
+
+
+class InFlightLookup:
+    def __init__(self):
+        self.done = threading.Event()
+        self.location = None
+        self.error = None
+
+
+class GeocodingService:
+    """Ищет локации адресов, геокодируя новые адреса.
+
+    Перед таблицей Location стоит кэш в памяти процесса. Если несколько потоков
+    одновременно ищут один и тот же новый адрес, геокодер вызывает только
+    первый из них, остальные ждут его результат.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.cache = LocationCache(max_size, ttl)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_location(self, address):
+        return self.get_locations([address]).get(address)
+
+    def get_locations(self, addresses):
+        """Возвращает словарь адрес → локация, как Location.objects.get_locations."""
+        address_keys = {address: normalize_address(address) for address in addresses}
+        locations = {}
+        own_lookups = {}
+        foreign_lookups = {}
+        with self._lock:
+            for address, address_key in address_keys.items():
+                if address_key in locations or address_key in own_lookups or address_key in foreign_lookups:
+                    continue
+                location = self.cache.get(address_key)
+                if location:
+                    locations[address_key] = location
+                elif address_key in self._in_flight:
+                    foreign_lookups[address_key] = self._in_flight[address_key]
+                else:
+                    own_lookups[address_key] = self._in_flight[address_key] = InFlightLookup()
+
+        if own_lookups:
+            locations.update(self._lookup(
+                {address: address_key for address, address_key in address_keys.items() if address_key in own_lookups},
+                own_lookups,
+            ))
+        for address_key, lookup in foreign_lookups.items():
+            lookup.done.wait()
+            if lookup.error:
+                raise lookup.error
+            if lookup.location:
+                locations[address_key] = lookup.location
+
+        return {
+            address: locations[address_key]
+            for address, address_key in address_keys.items()
+            if address_key in locations
+        }
+
+    def _lookup(self, address_keys, lookups):
+        try:
+            locations = {
+                address_keys[address]: location
+                for address, location in Location.objects.get_locations(address_keys, geocode_missing=True).items()
+            }
+        except Exception as error:
+            for lookup in lookups.values():
+                lookup.error = error
+            raise
+        else:
+            for address_key, location in locations.items():
+                self.cache.set(address_key, location)
+                lookups[address_key].location = location
+            return locations
+        finally:
+            with self._lock:
+                for address_key, lookup in lookups.items():
+                    del self._in_flight[address_key]
+                    lookup.done.set()
+
+
+geocoding_service = GeocodingService(
+    max_size=settings.GEOCODER_CACHE_SIZE,
+    ttl=settings.GEOCODER_CACHE_TTL,
+)
+
+
+@receiver(coordinates_updated, sender=Location)
+def forget_locations(sender, locations, **kwargs):
+    for location in locations:
+        geocoding_service.cache.delete(location.normalized_address)
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Отправляется после того, как у локаций появились или изменились координаты. Сохранение
+# без изменения координат, например записи о неудачном геокодировании, сигнал не отправляет.
+# Аргумент locations — список изменённых локаций.
+coordinates_updated = Signal()
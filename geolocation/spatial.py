@@ -0,0 +1,108 @@
+import heapq
+import math
+
+from geolocation.distances import EARTH_RADIUS_KM
+
+
+def to_unit_vector(latitude, longitude):
+    latitude = math.radians(float(latitude))
+    longitude = math.radians(float(longitude))
+    return (
+        math.cos(latitude) * math.cos(longitude),
+        math.cos(latitude) * math.sin(longitude),
+        math.sin(latitude),
+    )
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1))
+
+
+def km_to_chord(distance):
+    return 2 * math.sin(min(distance / (2 * EARTH_RADIUS_KM), math.pi / 2))
+
+
+class SpatialIndex:
+    """KD-дерево по точкам земной поверхности.
+
+    Точки хранятся как единичные векторы в трёхмерном пространстве, поэтому
+    расстояние между ними монотонно связано с расстоянием по поверхности
+    и не зависит от близости к полюсам или 180-му меридиану.
+    """
+
+    def __init__(self, points):
+        """points — последовательность троек (ключ, широта, долгота)."""
+        nodes = [(to_unit_vector(latitude, longitude), key) for key, latitude, longitude in points]
+        self.size = len(nodes)
+        self.root = self._build(nodes, depth=0)
+
+    def _build(self, nodes, depth):
+        if not nodes:
+            return None
+        axis = depth % 3
+        nodes.sort(key=lambda node: node[0][axis])
+        median = len(nodes) // 2
+        vector, key = nodes[median]
+        return (
+            vector,
+            key,
+            axis,
+            self._build(nodes[:median], depth + 1),
+            self._build(nodes[median + 1:], depth + 1),
+        )
+
+    def nearest(self, latitude, longitude, count=1, predicate=None):
+        """Возвращает до count ближайших точек списком пар (ключ, расстояние в км).
+
+        Если передан predicate, учитываются только точки, для ключей которых он истинен.
+        """
+        target = to_unit_vector(latitude, longitude)
+        found = []
+
+        def visit(node):
+            if node is None:
+                return
+            vector, key, axis, left, right = node
+            squared_distance = sum((a - b) ** 2 for a, b in zip(vector, target))
+            if predicate is None or predicate(key):
+                if len(found) < count:
+                    heapq.heappush(found, (-squared_distance, key))
+                elif squared_distance < -found[0][0]:
+                    heapq.heapreplace(found, (-squared_distance, key))
+            difference = target[axis] - vector[axis]
+            near, far = (left, right) if difference < 0 else (right, left)
+            visit(near)
+            if len(found) < count or difference ** 2 < -found[0][0]:
+                visit(far)
+
+        if count > 0:
+            visit(self.root)
+        return [
+            (key, chord_to_km(math.sqrt(-squared_distance)))
+            for squared_distance, key in sorted(found, reverse=True)
+        ]
+
+    def within(self, latitude, longitude, radius):
+        """Возвращает точки не дальше radius км списком пар (ключ, расстояние в км)."""
+        target = to_unit_vector(latitude, longitude)
+        squared_radius = km_to_chord(radius) ** 2
+        found = []
+
+        def visit(node):
+            if node is None:
+                return
+            vector, key, axis, left, right = node
+            squared_distance = sum((a - b) ** 2 for a, b in zip(vector, target))
+            if squared_distance <= squared_radius:
+                found.append((squared_distance, key))
+            difference = target[axis] - vector[axis]
+            near, far = (left, right) if difference < 0 else (right, left)
+            visit(near)
+            if difference ** 2 <= squared_radius:
+                visit(far)
+
+        visit(self.root)
+        return [
+            (key, chord_to_km(math.sqrt(squared_distance)))
+            for squared_distance, key in sorted(found)
+        ]
@@ -1,3 +1,303 @@
-from django.test import TestCase
+import random
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from geopy.exc import GeocoderQuotaExceeded, GeocoderTimedOut, GeocoderUnavailable
+
+from geolocation.addresses import normalize_address
+from geolocation.backends import GeocoderBackend, RateLimiter, ResilientBackend
+from geolocation.distances import get_distance_matrix
+from geolocation.models import Location
+from geolocation.signals import coordinates_updated
+from geolocation.spatial import SpatialIndex
+
+
+def make_points(randomizer, count):
+    # Большая часть точек вокруг Москвы, остальные по всему миру, включая полюса и 180-й меридиан
+    points = []
+    for key in range(count):
+        if randomizer.random() < 0.8:
+            points.append((key, randomizer.uniform(55.5, 56), randomizer.uniform(37.3, 37.9)))
+        else:
+            points.append((key, randomizer.uniform(-90, 90), randomizer.uniform(-180, 180)))
+    return points
+
+
+class FakeClock:
+    """Подменяет time в geolocation.backends: sleep не ждёт, а сдвигает monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ScriptedBackend(GeocoderBackend):
+    """Бэкенд, который по очереди возвращает заданные результаты или бросает заданные исключения."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls_count = 0
+
+    def geocode(self, address):
+        self.calls_count += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class BackendTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        time_patcher = mock.patch('geolocation.backends.time', self.clock)
+        time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+
+
+class RateLimiterTest(BackendTestCase):
+    def test_calls_are_spaced_by_interval(self):
+        rate_limiter = RateLimiter(rate=4)
+
+        for _ in range(3):
+            rate_limiter.wait()
+
+        self.assertEqual(self.clock.sleeps, [0, 0.25, 0.25])
+
+    def test_idle_time_is_not_accumulated(self):
+        rate_limiter = RateLimiter(rate=4)
+        rate_limiter.wait()
+        self.clock.now += 10
+
+        rate_limiter.wait()
+        rate_limiter.wait()
+
+        self.assertEqual(self.clock.sleeps, [0, 0, 0.25])
+
+    def test_zero_rate_does_not_limit(self):
+        rate_limiter = RateLimiter(rate=0)
+
+        for _ in range(3):
+            rate_limiter.wait()
+
+        self.assertEqual(self.clock.sleeps, [0, 0, 0])
+
+
+class ResilientBackendTest(BackendTestCase):
+    def test_backend_must_implement_geocode(self):
+        with self.assertRaises(TypeError):
+            GeocoderBackend()
+
+    def test_retries_with_growing_backoff(self):
+        backend = ScriptedBackend(GeocoderTimedOut(), GeocoderUnavailable(), (55.75, 37.61))
+        resilient_backend = ResilientBackend(backend, retries=2, backoff=0.5)
+
+        self.assertEqual(resilient_backend.geocode('Москва'), (55.75, 37.61))
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0])
+        self.assertEqual(resilient_backend.failures_count, 0)
+
+    def test_raises_when_retries_exhausted(self):
+        backend = ScriptedBackend(GeocoderTimedOut(), GeocoderTimedOut(), GeocoderTimedOut())
+        resilient_backend = ResilientBackend(backend, retries=2)
+
+        with self.assertRaises(GeocoderTimedOut):
+            resilient_backend.geocode('Москва')
+        self.assertEqual(backend.calls_count, 3)
+        self.assertEqual(resilient_backend.failures_count, 1)
+
+    def test_other_geopy_errors_are_not_retried(self):
+        backend = ScriptedBackend(GeocoderQuotaExceeded(), (55.75, 37.61))
+        resilient_backend = ResilientBackend(backend, retries=2)
+
+        with self.assertRaises(GeocoderQuotaExceeded):
+            resilient_backend.geocode('Москва')
+        self.assertEqual(backend.calls_count, 1)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(resilient_backend.failures_count, 1)
+
+    def test_open_circuit_fails_without_calling_backend(self):
+        backend = ScriptedBackend(GeocoderQuotaExceeded(), GeocoderQuotaExceeded())
+        resilient_backend = ResilientBackend(backend, failure_threshold=2, recovery_timeout=30)
+        for _ in range(2):
+            with self.assertRaises(GeocoderQuotaExceeded):
+                resilient_backend.geocode('Москва')
+
+        self.clock.now += 29
+        with self.assertRaises(GeocoderUnavailable):
+            resilient_backend.geocode('Москва')
+        self.assertEqual(backend.calls_count, 2)
+
+    def test_successful_probe_closes_circuit(self):
+        backend = ScriptedBackend(GeocoderQuotaExceeded(), (55.75, 37.61), (55.76, 37.62))
+        resilient_backend = ResilientBackend(backend, failure_threshold=1, recovery_timeout=30)
+        with self.assertRaises(GeocoderQuotaExceeded):
+            resilient_backend.geocode('Москва')
+
+        self.clock.now += 30
+        self.assertEqual(resilient_backend.geocode('Москва'), (55.75, 37.61))
+        self.assertEqual(resilient_backend.geocode('Москва'), (55.76, 37.62))
+        self.assertIsNone(resilient_backend.opened_at)
+
+    def test_failed_probe_reopens_circuit(self):
+        backend = ScriptedBackend(GeocoderQuotaExceeded(), GeocoderQuotaExceeded())
+        resilient_backend = ResilientBackend(backend, failure_threshold=1, recovery_timeout=30)
+        with self.assertRaises(GeocoderQuotaExceeded):
+            resilient_backend.geocode('Москва')
+
+        self.clock.now += 30
+        with self.assertRaises(GeocoderQuotaExceeded):
+            resilient_backend.geocode('Москва')
+        self.clock.now += 29
+        with self.assertRaises(GeocoderUnavailable):
+            resilient_backend.geocode('Москва')
+        self.assertEqual(backend.calls_count, 2)
+
+
+class NormalizeAddressTest(SimpleTestCase):
+    def test_normalize_address(self):
+        cases = [
+            ('Москва, ТВЕРСКАЯ 1', 'москва тверская 1'),
+            ('Москва, Тверская 1', 'москва тверская 1'),
+            ('Щёлково, Пролетарский проспект 5', 'щелково пролетарский проспект 5'),
+            ('  Москва ,,  Арбат   10 ', 'москва арбат 10'),
+            ('Москва, Ростов-на-Дону 3', 'москва ростов-на-дону 3'),
+            ('Москва, ул. Тверская 1', 'москва улица тверская 1'),
+            ('Москва, Ленинский пр-т 2', 'москва ленинский проспект 2'),
+            ('Москва, Гоголевский б-р 7 к. 2 стр. 1', 'москва гоголевский бульвар 7 корпус 2 строение 1'),
+            ('г. Москва, Тверская ул., д. 1', 'москва тверская улица 1'),
+            ('город Москва, улица Тверская, дом 1', 'москва улица тверская 1'),
+        ]
+        for address, address_key in cases:
+            with self.subTest(address=address):
+                self.assertEqual(normalize_address(address), address_key)
+
+    def test_same_address_spellings_merge(self):
+        cases = [
+            ('Москва, ул. Тверская, д. 1', 'г. москва улица тверская дом 1'),
+            ('Москва, Тверская 1 к. 2', 'МОСКВА ТВЕРСКАЯ 1 корпус 2'),
+            ('Королёв, пр. Космонавтов 3', 'Королев, проспект Космонавтов, 3'),
+            ('Москва, Тверская-Ямская 4', 'москва тверская-ямская 4'),
+        ]
+        for address, other_address in cases:
+            with self.subTest(address=address, other_address=other_address):
+                self.assertEqual(normalize_address(address), normalize_address(other_address))
+
+    def test_different_addresses_do_not_merge(self):
+        cases = [
+            ('Москва, Тверская 1', 'Москва, Тверская 11'),
+            ('Москва, Тверская 1 к. 2', 'Москва, Тверская 1 стр. 2'),
+            ('Москва, Тверская-Ямская 4', 'Москва, Тверская Ямская 4'),
+            ('Москва, Тверская 1', 'Тверь, Тверская 1'),
+            ('Москва, Большая Ордынка 5', 'Москва, Малая Ордынка 5'),
+        ]
+        for address, other_address in cases:
+            with self.subTest(address=address, other_address=other_address):
+                self.assertNotEqual(normalize_address(address), normalize_address(other_address))
+
+
+class SpatialIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.randomizer = random.Random(0)
+
+    def get_distances(self, points, latitude, longitude):
+        [distances] = get_distance_matrix([(latitude, longitude)], [point[1:] for point in points])
+        return {key: distance for (key, _, _), distance in zip(points, distances.tolist())}
+
+    def test_within_matches_haversine_filter(self):
+        for _ in range(100):
+            points = make_points(self.randomizer, self.randomizer.randint(0, 60))
+            index = SpatialIndex(points)
+            latitude, longitude = self.randomizer.uniform(55.5, 56), self.randomizer.uniform(37.3, 37.9)
+            radius = self.randomizer.choice([0, 1, 5, 20, 100, 5000, 30000])
+
+            found = index.within(latitude, longitude, radius)
+
+            distances = self.get_distances(points, latitude, longitude)
+            with self.subTest(radius=radius, points_count=len(points)):
+                # Точки на самой границе радиуса могут разойтись из-за округления, их не сравниваем
+                self.assertEqual(
+                    {key for key, _ in found if abs(distances[key] - radius) > 1e-6},
+                    {key for key, distance in distances.items() if distance < radius - 1e-6},
+                )
+                for key, distance in found:
+                    self.assertAlmostEqual(distance, distances[key], places=6)
+                self.assertEqual([distance for _, distance in found], sorted(distance for _, distance in found))
+
+    def test_nearest_matches_haversine_sort(self):
+        for _ in range(100):
+            points = make_points(self.randomizer, self.randomizer.randint(1, 60))
+            index = SpatialIndex(points)
+            latitude, longitude = self.randomizer.uniform(-90, 90), self.randomizer.uniform(-180, 180)
+            count = self.randomizer.randint(1, 5)
+            allowed_keys = {key for key, _, _ in points if self.randomizer.random() < 0.5}
+
+            found = index.nearest(latitude, longitude, count=count, predicate=allowed_keys.__contains__)
+
+            distances = self.get_distances(points, latitude, longitude)
+            expected_distances = sorted(distances[key] for key in allowed_keys)[:count]
+            with self.subTest(count=count, points_count=len(points)):
+                self.assertTrue({key for key, _ in found} <= allowed_keys)
+                self.assertEqual(len(found), len(expected_distances))
+                for (_, distance), expected_distance in zip(found, expected_distances):
+                    self.assertAlmostEqual(distance, expected_distance, places=6)
+
+
+class CoordinatesUpdatedTest(TestCase):
+    def setUp(self):
+        self.updated_addresses = []
+        coordinates_updated.connect(self.record_updated, sender=Location)
+        self.addCleanup(coordinates_updated.disconnect, self.record_updated, sender=Location)
+        geocoder_patcher = mock.patch('geolocation.models.get_geocoder')
+        self.geocoder = geocoder_patcher.start().return_value
+        self.addCleanup(geocoder_patcher.stop)
+
+    def record_updated(self, sender, locations, **kwargs):
+        self.updated_addresses.append(sorted(location.raw_address for location in locations))
+
+    def test_save_sends_only_coordinate_changes(self):
+        location = Location.objects.create(raw_address='Москва, Арбат 10')
+        location.save()
+        location.latitude, location.longitude = 55.751, 37.59
+        location.save()
+        location.updated_at = location.updated_at.replace(year=2000)
+        location.save()
+        location = Location.objects.get(pk=location.pk)
+        location.latitude, location.longitude = 55.7510001, 37.59
+        location.save()
+
+        self.assertEqual(self.updated_addresses, [['Москва, Арбат 10']])
+
+    def test_save_geocoded_sends_only_coordinate_changes(self):
+        Location.objects.create(raw_address='Москва, Тверская 1', latitude=55.757, longitude=37.613)
+        self.updated_addresses.clear()
+        self.geocoder.geocode.side_effect = lambda address: {
+            'Москва, Тверская 1': (55.757, 37.613),
+            'Москва, Арбат 10': (55.751, 37.59),
+        }.get(address)
+
+        locations = Location.objects.get_locations(
+            ['Москва, Тверская 1', 'Москва, Арбат 10', 'Москва, Неизвестная 5'],
+            geocode_missing=True,
+        )
+        locations['Москва, Тверская 1'].process_coordinates()
+        Location.objects.save_geocoded([locations['Москва, Тверская 1']])
+
+        self.assertEqual(self.updated_addresses, [['Москва, Арбат 10']])
+
+
+class LocationNormalizedAddressTest(TestCase):
+    def test_longest_address_fits_normalized_address(self):
+        # Самое сильное удлинение даёт «к.», которое раскрывается в «корпус»
+        raw_address_max_length = Location._meta.get_field('raw_address').max_length
+        raw_address = ('к.' * raw_address_max_length)[:raw_address_max_length]
+
+        location = Location.objects.create(raw_address=raw_address)
+
+        location.full_clean(exclude=['latitude', 'longitude'])
+        self.assertGreater(len(location.normalized_address), raw_address_max_length)
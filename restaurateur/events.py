@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest
+
+from restaurateur.views import is_manager
+
+KEEPALIVE_INTERVAL = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class OrderEventsBroker:
+    """Раздаёт события о заказах подписчикам, подключённым к этому процессу.
+
+    Публиковать события можно из любого потока, подписчики получают их
+    в своём цикле событий asyncio.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, order_id):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_put_event, queue, {'event': event, 'id': order_id})
+
+
+def _put_event(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Клиент не успевает читать события, он всё равно догонит изменения по курсору
+        pass
+
+
+broker = OrderEventsBroker()
+
+
+@sync_to_async
+def get_scope_user(scope):
+    cookies = SimpleCookie()
+    for name, value in scope['headers']:
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    session_cookie = cookies.get(settings.SESSION_COOKIE_NAME)
+
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(
+        session_cookie.value if session_cookie else None
+    )
+    try:
+        return get_user(request)
+    finally:
+        close_old_connections()
+
+
+async def order_events_application(scope, receive, send):
+    """ASGI-приложение, которое держит SSE-поток событий о заказах для менеджеров."""
+    user = await get_scope_user(scope)
+    if not is_manager(user):
+        await send({'type': 'http.response.start', 'status': 403, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    subscriber = broker.subscribe()
+    _, queue = subscriber
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        while not disconnect.done():
+            next_message = asyncio.ensure_future(queue.get())
+            await asyncio.wait([next_message, disconnect], timeout=KEEPALIVE_INTERVAL,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if next_message.done():
+                message = next_message.result()
+                body = f'event: {message["event"]}\ndata: {json.dumps({"id": message["id"]})}\n\n'
+            else:
+                next_message.cancel()
+                body = ': keepalive\n\n'
+            if not disconnect.done():
+                await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+    finally:
+        broker.unsubscribe(subscriber)
+        disconnect.cancel()
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodcartapp.models import Order, OrderItem
+from restaurateur.events import broker
+
+
+@receiver(post_save, sender=Order)
+def publish_order_saved(sender, instance, created, **kwargs):
+    event = 'order_created' if created else 'order_updated'
+    transaction.on_commit(lambda: broker.publish(event, instance.id))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def publish_order_item_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: broker.publish('order_updated', instance.order_id))
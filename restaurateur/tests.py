@@ -1,3 +1,44 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import now
+
+from foodcartapp.intake import create_orders
+from foodcartapp.models import Product
+from restaurateur.views import ORDERS_CHANGES_LIMIT, encode_changes_cursor
+
+
+class OrdersChangesTest(TestCase):
+    def setUp(self):
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+        # Лента подбирает рестораны и геокодирует адреса заказов: в тестах обходимся без Яндекса
+        geocoder_patcher = mock.patch('geolocation.models.get_geocoder')
+        geocoder_patcher.start().return_value.geocode.return_value = None
+        self.addCleanup(geocoder_patcher.stop)
+
+    def test_feed_passes_full_pages_of_orders_changed_at_once(self):
+        product = Product.objects.create(name='Бургер', price=100)
+        orders = create_orders([
+            (
+                {'firstname': 'Иван', 'lastname': 'Петров', 'phonenumber': '+79161234567', 'address': f'Новая {i}'},
+                [{'product': product, 'quantity': 1}],
+            )
+            for i in range(ORDERS_CHANGES_LIMIT * 2 + 50)
+        ])
+
+        cursor = encode_changes_cursor(now() - timedelta(minutes=1), 0)
+        received_ids = set()
+        for _ in range(4):
+            changes = self.client.get(reverse('restaurateur:view_orders_changes'), {'since': cursor}).json()
+            received_ids.update(order['id'] for order in changes['orders'])
+            cursor = changes['cursor']
+
+        self.assertEqual(received_ids, {order.id for order in orders})
 
-# Create your tests here.
+    def test_bad_cursor(self):
+        response = self.client.get(reverse('restaurateur:view_orders_changes'), {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
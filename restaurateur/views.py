@@ -1,16 +1,24 @@
+from datetime import datetime, timedelta, timezone
+
 from django import forms
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
-from django.db.models import Prefetch
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils.timezone import now
 from django.views import View
-from geopy import distance
 
-from foodcartapp.models import (Order, OrderItem, OrderStatus, Product,
-                                Restaurant, RestaurantMenuItem)
-from geolocation.models import Location
+from foodcartapp.assignment import rank_restaurants
+from foodcartapp.models import Order, OrderStatus, Product, Restaurant
+
+ORDERS_PAGE_SIZE = 50
+ORDERS_CHANGES_LIMIT = 200
+ORDERS_CHANGES_OVERLAP = timedelta(seconds=5)
+CLOSED_ORDER_STATUSES = [OrderStatus.DONE.value, OrderStatus.CANCELED.value]
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 class Login(forms.Form):
@@ -105,87 +113,127 @@ def serialize_order(order, total, restaurants):
         'total': total,
         'restaurant': order.cooking_restaurant.name if order.cooking_restaurant else '',
         'restaurants': restaurants,
+        'sort_key': encode_orders_cursor(order),
     }
 
 
-def get_order_item_restaurants(restaurants_menu_items, order_item):
-    if order_item.order.cooking_restaurant:
-        return set()
+def get_order_restaurants(restaurants_with_distance):
+    return [
+        f'{restaurant.name} - {round(restaurant_distance, 2)} км'
+        for restaurant, restaurant_distance in restaurants_with_distance
+    ]
+
 
-    return {
-        restaurants_menu_item.restaurant
-        for restaurants_menu_item in restaurants_menu_items
-        if restaurants_menu_item.product.id == order_item.product.id
-    }
+def to_microseconds(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
 
 
-def get_order_restaurants(order_address, restaurants, location_map):
-    order_location = location_map.get(order_address)
-    if not order_location:
-        return []
-    order_coordinates = (order_location['latitude'], order_location['longitude'])
-    restaurants_with_distance = []
-    for restaurnt in restaurants:
-        restaurant_coordinates = (location_map.get(restaurnt.address)['latitude'],
-                                  location_map.get(restaurnt.address)['longitude'])
-        restaurants_with_distance.append(
-            (restaurnt.name, (distance.distance(restaurant_coordinates, order_coordinates).km))
-        )
-    restaurants_with_distance.sort(key=lambda x: x[1])
+def from_microseconds(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode_orders_cursor(order):
+    return f'{order.status}-{to_microseconds(order.registered_at)}-{order.id}'
+
+
+def decode_orders_cursor(cursor):
+    try:
+        status, registered_at, order_id = map(int, cursor.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return status, from_microseconds(registered_at), order_id
+
+
+def encode_changes_cursor(updated_at, order_id):
+    return f'{to_microseconds(updated_at)}-{order_id}'
+
+
+def decode_changes_cursor(cursor):
+    try:
+        updated_at, order_id = map(int, cursor.split('-'))
+        return from_microseconds(updated_at), order_id
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def get_dashboard_orders():
+    return (
+        Order.objects
+        .select_related('cooking_restaurant')
+        .prefetch_related('items')
+    )
+
+
+def serialize_orders(orders):
+    orders_restaurants = rank_restaurants(
+        [order for order in orders if not order.cooking_restaurant],
+        geocode_missing=True,
+    )
     return [
-        f'{restaurant_name} - {round(restaurant_distance, 2)} км'
-        for restaurant_name, restaurant_distance in restaurants_with_distance
+        serialize_order(order, order.total_price, get_order_restaurants(orders_restaurants.get(order.id, [])))
+        for order in orders
     ]
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    order_items = (
-        OrderItem.objects
-        .prefetch_related(Prefetch('order', queryset=Order.objects.total_price()),
-                          'product',
-                          'order__cooking_restaurant')
-        .exclude(order__status__in=[OrderStatus.DONE.value, OrderStatus.CANCELED.value])
-        .order_by('order__status', 'order__registered_at')
-    )
-    restaurant_menu_items = (
-        RestaurantMenuItem.objects
-        .filter(availability=True)
-        .prefetch_related('restaurant', 'product')
+    changes_cursor = encode_changes_cursor(now() - ORDERS_CHANGES_OVERLAP, 0)
+    orders = get_dashboard_orders().not_done().order_by('status', 'registered_at', 'id')
+    cursor = decode_orders_cursor(request.GET.get('after'))
+    if cursor:
+        orders = orders.after(*cursor)
+    orders = list(orders[:ORDERS_PAGE_SIZE + 1])
+    next_cursor = encode_orders_cursor(orders[ORDERS_PAGE_SIZE - 1]) if len(orders) > ORDERS_PAGE_SIZE else None
+    orders = orders[:ORDERS_PAGE_SIZE]
+
+    return render(request, template_name='order_items.html', context={
+        'order_items': serialize_orders(orders),
+        'is_first_page': cursor is None,
+        'next_cursor': next_cursor,
+        'changes_cursor': changes_cursor,
+        'next_url': request.get_full_path(),
+    })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_changes(request):
+    cursor = decode_changes_cursor(request.GET.get('since'))
+    if not cursor:
+        return JsonResponse({'error': 'Укажите курсор в параметре since'}, status=400)
+
+    changes_started_at = now()
+    changed_orders = list(
+        get_dashboard_orders()
+        .changed_after(*cursor)
+        .order_by('updated_at', 'id')[:ORDERS_CHANGES_LIMIT]
     )
-    restaurants_addresses = {restaurant_menu_item.restaurant.address for restaurant_menu_item in restaurant_menu_items}
-    orders_addresses = {order_item.order.address for order_item in order_items}
-    addresses = restaurants_addresses | orders_addresses
-    locations = [location for location in Location.objects.filter(raw_address__in=addresses)]
-    diff_addresses = addresses.difference({location.raw_address for location in locations})
-    new_locations = []
-    for address in diff_addresses:
-        location = Location(raw_address=address)
-        location.process_coordinates()
-        new_locations.append(location)
-    if diff_addresses:
-        locations += Location.objects.bulk_create(new_locations)
-    location_map = {}
-    for location in locations:
-        location_map[location.raw_address] = {
-            'latitude': location.latitude,
-            'longitude': location.longitude,
-        }
-
-    orders = []
-    order = None
-    order_restaurants = None
-    for order_item in order_items:
-        if not order or order_item.order.id != order.id:
-            if order:
-                restaurants_definitions = get_order_restaurants(order.address, order_restaurants, location_map)
-                orders.append(serialize_order(order, order_item.order.total, restaurants_definitions))
-            order = order_item.order
-            order_restaurants = get_order_item_restaurants(restaurant_menu_items, order_item)
-        else:
-            order_restaurants = order_restaurants & get_order_item_restaurants(restaurant_menu_items, order_item)
-
-    if order:
-        restaurants_definitions = get_order_restaurants(order.address, order_restaurants, location_map)
-        orders.append(serialize_order(order, order_item.order.total, restaurants_definitions))
-    return render(request, template_name='order_items.html', context={'order_items': orders})
+    if len(changed_orders) == ORDERS_CHANGES_LIMIT:
+        # Изменений больше, чем влезает в ответ: следующий запрос продолжит сразу после последнего заказа
+        next_cursor = encode_changes_cursor(changed_orders[-1].updated_at, changed_orders[-1].id)
+    else:
+        # Все изменения прочитаны. Но заказ, изменённый незадолго до запроса, мог попасть в базу позже
+        # других, поэтому последние ORDERS_CHANGES_OVERLAP секунд перечитываются при следующем опросе
+        next_cursor = encode_changes_cursor(changes_started_at - ORDERS_CHANGES_OVERLAP, 0)
+    open_orders = [order for order in changed_orders if order.status not in CLOSED_ORDER_STATUSES]
+    removed_orders = [order for order in changed_orders if order.status in CLOSED_ORDER_STATUSES]
+    next_url = reverse('restaurateur:view_orders')
+    return JsonResponse({
+        'cursor': next_cursor,
+        'orders': [
+            {
+                'id': serialized_order['id'],
+                'sort_key': serialized_order['sort_key'],
+                'html': render_to_string('order_row.html', {'item': serialized_order, 'next_url': next_url}),
+            }
+            for serialized_order in serialize_orders(open_orders)
+        ],
+        'removed': [order.id for order in removed_orders],
+    })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_events(request):
+    # Поток событий отдаёт ASGI-приложение из star_burger/asgi.py. Если сайт запущен
+    # через WSGI, ответ 204 говорит браузеру не переподключаться, страница заказов
+    # тогда просто опрашивает сервер
+    return HttpResponse(status=204)
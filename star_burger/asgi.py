@@ -0,0 +1,29 @@
+"""
+ASGI config for Django project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Besides the Django site it serves the stream of order events for the manager
+dashboard, which keeps many idle connections open.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "star_burger.settings")
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402
+
+from restaurateur.events import order_events_application  # noqa: E402
+
+order_events_path = reverse('restaurateur:view_orders_events')
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == order_events_path:
+        await order_events_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -15,6 +15,18 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', True)
 YANDEX_API_KEY = env('YANDEX_API_KEY')
+ORDER_JOURNAL_PATH = env('ORDER_JOURNAL_PATH', None)
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', 24)
+DELIVERY_RADIUS_KM = env.float('DELIVERY_RADIUS_KM', None)
+GEOCODER_BACKEND = env('GEOCODER_BACKEND', 'geolocation.backends.YandexBackend')
+GEOCODER_GAZETTEER_PATH = env('GEOCODER_GAZETTEER_PATH', None)
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 2)
+GEOCODER_RETRIES = env.int('GEOCODER_RETRIES', 2)
+GEOCODER_FAILURE_THRESHOLD = env.int('GEOCODER_FAILURE_THRESHOLD', 5)
+GEOCODER_RECOVERY_TIMEOUT = env.int('GEOCODER_RECOVERY_TIMEOUT', 30)
+GEOCODER_MAX_AGE_DAYS = env.int('GEOCODER_MAX_AGE_DAYS', 30)
+GEOCODER_CACHE_SIZE = env.int('GEOCODER_CACHE_SIZE', 1024)
+GEOCODER_CACHE_TTL = env.int('GEOCODER_CACHE_TTL', 600)
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', ['127.0.0.1', 'localhost'])
 
@@ -101,6 +113,10 @@ DATABASES = {
     )
 }
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',